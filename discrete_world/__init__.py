@@ -1,5 +1,12 @@
 from discrete_world import grid
+from discrete_world import vector
+from discrete_world import multi
+from discrete_world import env
 
 GridWorld = grid.GridWorld
 GridStates = grid.States
 GridActions = grid.Actions
+BatchedGridWorld = vector.BatchedGridWorld
+MultiAgentGridWorld = multi.MultiAgentGridWorld
+GridWorldEnv = env.GridWorldEnv
+GridWorldVectorEnv = env.GridWorldVectorEnv
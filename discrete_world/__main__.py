@@ -12,7 +12,9 @@ from discrete_world.agent import Agent
 
 
 def readWorld(fp):
-    """ Reads a grid-world from an .env file. """
+    """ Reads a grid-world from an .env file, or a binary .world file. """
+    if Path(fp).suffix == ".world":
+        return G.load(fp)
     with open(fp, "rb") as data_file:
         data = pickle.load(data_file)
     return data
@@ -1,19 +1,29 @@
 import random
+from typing import Optional
+
+import numpy as np
 
 
 class Agent:
     def __init__(self, world):
         self.world = world
 
-    def gen_policy(self):
-        """ Generates a random policy for the agent. """
+    def gen_policy(self, policy: Optional[np.ndarray] = None, n_steps: int = 5):
+        """Generates a random policy for the agent.
+
+        If `policy` is given, the agent instead follows it. It is an (S,) array of
+        actions over flat state indices, e.g. as returned by `discrete_world.solvers`.
+        """
         self.states = []
         env = self.world
         env.reset()
-        s = env.init_pos
-        for i in range(5):
+        s = env.current_state
+        for i in range(n_steps):
             self.states.append(s)
-            a = env.action_space.sample()
+            if policy is None:
+                a = env.action_space.sample()
+            else:
+                a = int(policy[env.current_index])
             s_, r, done = env.step(a)
             print(f"State: {s}, Action: {a}, Reward: {r}")
             s = s_
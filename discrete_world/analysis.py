@@ -0,0 +1,205 @@
+"""Exact analysis of the Markov chain that a policy induces on a grid-world.
+
+Under a fixed policy, the grid-world is a Markov chain over the flat state indices,
+with the goals and obstacles absorbing as in `GridWorld.done_function`. Instead of
+sampling episodes, the probabilities of ending in a goal or in an obstacle, the
+expected number of steps until the episode ends and the expected returns are the
+solutions of sparse linear systems over the transient states:
+
+    x = P_TT x + P_TA a    (absorption probabilities, with a = 1 on the goals)
+    t = P_TT t + 1         (expected steps)
+
+The systems are factorized once with the sparse LU decomposition of scipy and solved
+for all right-hand sides at once, which takes seconds for worlds with millions of
+cells. States that can never be absorbed, or that can reach such states, are
+handled separately with graph searches, as the systems are singular there.
+
+Policies are (S,) arrays of actions or (S, A) arrays of action probabilities.
+"""
+from typing import Tuple, NamedTuple
+
+import numpy as np
+
+from discrete_world.grid import GridWorld
+
+try:
+    from scipy import sparse
+    from scipy.sparse.csgraph import breadth_first_order
+    from scipy.sparse.linalg import splu
+except ImportError:
+    sparse = None
+
+
+class ChainAnalysis(NamedTuple):
+    """Exact statistics of the episodes of a policy from every state."""
+
+    goal_probs: np.ndarray  # (S,) probability that the episode ends in a goal
+    obstacle_probs: np.ndarray  # (S,) probability that it ends in an obstacle
+    expected_steps: np.ndarray  # (S,) steps until it ends, inf if it may not end
+    values: np.ndarray  # (S,) expected discounted return, NaN if undefined
+
+    def at(self, world: GridWorld, state: Tuple[int, int]) -> "ChainAnalysis":
+        """The statistics of a single (row, col) state, as floats."""
+        s = world.state_to_index(state)
+        return ChainAnalysis._make(float(field[s]) for field in self)
+
+
+def _check_scipy():
+    if sparse is None:
+        raise ImportError("Markov chain analysis requires scipy")
+
+
+def _policy_probs(policy: np.ndarray, n_states: int, n_actions: int) -> np.ndarray:
+    policy = np.asarray(policy)
+    if policy.shape == (n_states,):
+        return policy
+    if policy.shape != (n_states, n_actions):
+        raise ValueError(
+            "Expected a ({},) or ({}, {}) policy. Got {}".format(
+                n_states, n_states, n_actions, policy.shape
+            )
+        )
+    if not np.allclose(policy.sum(axis=-1), 1.0):
+        raise ValueError("The action probabilities of every state must sum to 1")
+    return policy
+
+
+def induced_chain(world: GridWorld, policy: np.ndarray) -> Tuple:
+    """The Markov chain of a policy on `world.transition_model`.
+
+    Returns:
+        The (S, S) `scipy.sparse.csr_matrix` of P(s' | s), without explicit zeros
+        and with the terminal states absorbing, and the (S,) expected reward of a
+        step from every state.
+    """
+    _check_scipy()
+    model = world.transition_model
+    n_states, n_actions, n_outcomes = model.next_states.shape
+    policy = _policy_probs(policy, n_states, n_actions)
+    states = np.arange(n_states)
+    if policy.ndim == 1:
+        # (S, K) outcomes of the chosen actions only
+        next_states = model.next_states[states, policy]
+        probs = model.probs[states, policy]
+        rewards = np.sum(probs * model.rewards[states, policy], axis=-1)
+        per_state = n_outcomes
+    else:
+        next_states = model.next_states
+        probs = policy[:, :, None] * model.probs
+        rewards = np.sum(probs * model.rewards, axis=(1, 2))
+        per_state = n_actions * n_outcomes
+
+    P = sparse.csr_matrix(
+        (
+            probs.reshape(-1).astype(float),
+            next_states.reshape(-1),
+            np.arange(0, n_states * per_state + 1, per_state),
+        ),
+        shape=(n_states, n_states),
+    )
+    # Terminal states are absorbing, and nothing is collected once there
+    terminal = world.terminal_mask
+    P = sparse.diags((~terminal).astype(float)) @ P + sparse.diags(terminal * 1.0)
+    P = P.tocsr()
+    P.sum_duplicates()  # e.g. both slips of a corner state stay in place
+    P.eliminate_zeros()  # actions the policy never takes are not edges
+    return P, np.where(terminal, 0.0, rewards)
+
+
+def _reaching(P, targets: np.ndarray) -> np.ndarray:
+    """(S,) boolean array of the states from which a state of the `targets` mask can
+    be reached, including the targets."""
+    n_states = P.shape[0]
+    targets = np.flatnonzero(targets)
+    reached = np.zeros(n_states, dtype=bool)
+    if len(targets) == 0:
+        return reached
+
+    # Backwards search from an extra node that has an edge to every target
+    reverse = P.T.tocsr()
+    indptr = np.append(reverse.indptr, reverse.indptr[-1] + len(targets))
+    indices = np.concatenate([reverse.indices, targets])
+    graph = sparse.csr_matrix(
+        (np.ones(len(indices)), indices, indptr), shape=(n_states + 1, n_states + 1)
+    )
+    order = breadth_first_order(
+        graph, n_states, directed=True, return_predecessors=False
+    )
+    reached[order[1:]] = True
+    return reached
+
+
+def _factorize(P, states: np.ndarray, gamma: float = 1.0):
+    """Sparse LU factorization of `I - gamma * P` restricted to `states`."""
+    P_states = P[states][:, states]
+    A = sparse.identity(len(states), format="csc") - gamma * P_states.tocsc()
+    return splu(A.tocsc(), permc_spec="COLAMD")
+
+
+def analyze_policy(
+    world: GridWorld, policy: np.ndarray, gamma: float = 1.0
+) -> ChainAnalysis:
+    """Absorption probabilities, expected steps and values of a policy.
+
+    Args:
+        world: The grid-world, whose `terminal_mask` states are absorbing.
+        policy: (S,) actions or (S, A) action probabilities.
+        gamma: Discount factor of the values. With `gamma=1`, the values are only
+            defined on the states where the episode surely ends.
+    """
+    P, rewards = induced_chain(world, policy)
+    terminal = world.terminal_mask
+    goals = world.goal_mask.reshape(-1)
+    obstacles = world.obstacle_mask.reshape(-1)
+
+    # Transient states that are absorbed with a positive probability, and those that
+    # are surely absorbed since they cannot reach a state that never is
+    can_end = _reaching(P, terminal)
+    absorbable = can_end & ~terminal
+    sure = ~_reaching(P, ~can_end) & ~terminal
+
+    goal_probs = goals.astype(float)
+    obstacle_probs = obstacles.astype(float)
+    states = np.flatnonzero(absorbable)
+    lu = None
+    if len(states):
+        lu = _factorize(P, states)
+        into = P[states]
+        rhs = np.stack([into @ goal_probs, into @ obstacle_probs], axis=-1)
+        goal_probs[states], obstacle_probs[states] = lu.solve(rhs).T
+
+    expected_steps = np.where(terminal, 0.0, np.inf)
+    values = np.where(terminal, 0.0, np.nan)
+    states = np.flatnonzero(sure)
+    if len(states):
+        if lu is None or not np.array_equal(sure, absorbable):
+            lu = _factorize(P, states)
+        rhs = np.stack([np.ones(len(states)), rewards[states]], axis=-1)
+        expected_steps[states], sure_values = lu.solve(rhs).T
+        if gamma == 1:
+            values[states] = sure_values
+    if gamma < 1:
+        states = np.flatnonzero(~terminal)
+        values[states] = _factorize(P, states, gamma).solve(rewards[states])
+
+    return ChainAnalysis(goal_probs, obstacle_probs, expected_steps, values)
+
+
+def reach_probabilities(
+    world: GridWorld, policy: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """(S,) probabilities that the episode of a policy ends in a goal, that is reaches
+    a goal before any obstacle, and (S,) probabilities that it ends in an obstacle."""
+    analysis = analyze_policy(world, policy)
+    return analysis.goal_probs, analysis.obstacle_probs
+
+
+def expected_hitting_times(world: GridWorld, policy: np.ndarray) -> np.ndarray:
+    """(S,) expected number of steps until the episode of a policy ends, inf where it
+    may go on forever."""
+    return analyze_policy(world, policy).expected_steps
+
+
+def induced_values(world: GridWorld, policy: np.ndarray, gamma: float) -> np.ndarray:
+    """(S,) exact expected discounted returns of a policy."""
+    return analyze_policy(world, policy, gamma).values
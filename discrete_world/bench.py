@@ -0,0 +1,232 @@
+"""Benchmarks of the hot paths of the grid-world.
+
+Usage: python -m discrete_world.bench [--sizes 10 100 500] [--output results.json]
+
+Every benchmark reports the median time per call over a few repeats, and the
+results are printed and optionally written as JSON, so that they can be compared
+between releases.
+"""
+import sys
+import json
+import time
+import pickle
+import timeit
+import argparse
+import platform
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Callable, Optional
+
+import numpy as np
+
+from discrete_world.grid import GridWorld
+from discrete_world.vector import BatchedGridWorld
+from discrete_world import solvers
+
+
+def _measure(fn: Callable[[], Any], number: int, repeat: int) -> float:
+    """Median time of one call of `fn`, in seconds."""
+    times = timeit.Timer(fn).repeat(repeat=repeat, number=number)
+    return float(np.median(times)) / number
+
+
+def make_world(size: int, seed: int = 0) -> GridWorld:
+    """A `size` x `size` world with 10% random obstacles and a goal in a corner."""
+    rng = np.random.default_rng(seed)
+    obstacles = np.argwhere(rng.random((size, size)) < 0.1)
+    init_pos, goal = (size - 1, 0), (0, size - 1)
+    keep = ~np.all(obstacles == init_pos, axis=1) & ~np.all(obstacles == goal, axis=1)
+    return GridWorld(size, size, init_pos, [goal], obstacles[keep], 0.2, seed=seed)
+
+
+def bench_construction(size: int) -> Dict[str, float]:
+    world = make_world(size)
+    obstacles = np.argwhere(world.obstacle_mask)
+    goals = list(world.goals)
+
+    def construct():
+        GridWorld(size, size, world.init_pos, goals, obstacles, world.p_slip)
+
+    return {
+        "init": _measure(construct, 1, 5),
+        "initialize_rewards": _measure(world._initialize_rewards, 1, 5),
+    }
+
+
+def bench_step(size: int, n_steps: int = 20000) -> Dict[str, float]:
+    world = make_world(size)
+    actions = np.random.default_rng(0).integers(0, 4, n_steps).tolist()
+    states = [world.index_to_state(s) for s in range(min(world.n_states, n_steps))]
+
+    def step():
+        world.reset()
+        for a in actions:
+            world.step(a)
+
+    def fast_step():
+        world.enable_fast_step()
+        step()
+        world.disable_fast_step()
+
+    def flat_fast_step():
+        world.flat_states = True
+        fast_step()
+        world.flat_states = False
+
+    def choose_action():
+        for a in actions:
+            world.choose_action(a)
+
+    def neighbors():
+        for s in states:
+            world.neighbors(s)
+
+    def flat_neighbors():
+        world.flat_states = True
+        for s in range(len(states)):
+            world.neighbors(s)
+        world.flat_states = False
+
+    return {
+        "step": _measure(step, 1, 3) / n_steps,
+        "fast_step": _measure(fast_step, 1, 3) / n_steps,
+        "flat_fast_step": _measure(flat_fast_step, 1, 3) / n_steps,
+        "choose_action": _measure(choose_action, 1, 3) / n_steps,
+        "neighbors": _measure(neighbors, 1, 3) / len(states),
+        "flat_neighbors": _measure(flat_neighbors, 1, 3) / len(states),
+    }
+
+
+def bench_batched_step(size: int, num_envs: int = 4096) -> Dict[str, float]:
+    env = BatchedGridWorld(make_world(size), num_envs, seed=0)
+    actions = np.random.default_rng(0).integers(0, 4, num_envs)
+    return {"batched_step": _measure(lambda: env.step(actions), 20, 3) / num_envs}
+
+
+def bench_io(size: int) -> Dict[str, float]:
+    world = make_world(size)
+    with tempfile.TemporaryDirectory() as tmp:
+        env_file = Path(tmp) / "world.env"
+        world_file = Path(tmp) / "world.world"
+
+        def pickle_load():
+            with open(env_file, "rb") as data_file:
+                pickle.load(data_file)
+
+        return {
+            "pickle_save": _measure(lambda: world.save_object(env_file), 1, 5),
+            "pickle_load": _measure(pickle_load, 1, 5),
+            "binary_save": _measure(lambda: world.save(world_file), 1, 5),
+            "binary_load": _measure(lambda: GridWorld.load(world_file), 1, 5),
+        }
+
+
+def bench_planning(size: int, n_sweeps: int = 10) -> Dict[str, float]:
+    world = make_world(size)
+
+    def build_model():
+        world._invalidate_model()
+        world.transition_model
+
+    def value_iteration():
+        solvers.value_iteration(world, tol=0.0, max_iter=n_sweeps)
+
+    return {
+        "transition_model": _measure(build_model, 1, 3),
+        "value_iteration_sweep": _measure(value_iteration, 1, 3) / n_sweeps,
+    }
+
+
+def bench_plotting(size: int) -> Dict[str, float]:
+    from discrete_world import plotting
+    from discrete_world.agent import Agent
+
+    agent = Agent(make_world(size))
+    agent.states = [agent.world.init_pos] * 5
+    with tempfile.TemporaryDirectory() as tmp:
+
+        def plot():
+            plotting.gen_plots(agent, Path(tmp), Path("bench.env"))
+
+        return {"gen_plots": _measure(plot, 1, 3)}
+
+
+BENCHMARKS = {
+    "construction": bench_construction,
+    "step": bench_step,
+    "batched_step": bench_batched_step,
+    "io": bench_io,
+    "planning": bench_planning,
+    "plotting": bench_plotting,
+}
+
+
+def run(
+    sizes: List[int], benchmarks: Optional[List[str]] = None, verbose: bool = True
+) -> Dict[str, Any]:
+    """Runs the benchmarks on square worlds of the given sizes.
+
+    Returns:
+        A JSON-serializable dict with the environment in "meta", and one entry per
+        benchmark, measurement and size in "results", with the median seconds per
+        call and the calls per second.
+    """
+    results = []
+    for name in benchmarks or list(BENCHMARKS):
+        for size in sizes:
+            for key, seconds in BENCHMARKS[name](size).items():
+                per_second = 1.0 / seconds if seconds > 0 else float("inf")
+                results.append(
+                    {
+                        "benchmark": name,
+                        "name": key,
+                        "size": size,
+                        "cells": size * size,
+                        "seconds": seconds,
+                        "per_second": per_second,
+                    }
+                )
+                if verbose:
+                    print(
+                        "{:>14} {:>24} {:>6}x{:<6} {:12.3e} s {:12.1f} /s".format(
+                            name, key, size, size, seconds, per_second
+                        )
+                    )
+
+    meta = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+    }
+    return {"meta": meta, "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grid-World benchmarks")
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        type=int,
+        default=[10, 100, 500],
+        help="Side lengths of the benchmarked worlds",
+    )
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        choices=sorted(BENCHMARKS),
+        help="Run only these benchmarks",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=lambda p: Path(p).absolute(),
+        help="Path of a JSON file to write the results to",
+    )
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.only)
+    if args.output is not None:
+        with open(args.output, "w") as results_file:
+            json.dump(report, results_file, indent=2)
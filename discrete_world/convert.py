@@ -0,0 +1,40 @@
+"""Converts pickled `.env` grid-worlds to the binary `.world` format.
+
+Usage: python -m discrete_world.convert envs/env1.env [envs/env2.env ...]
+"""
+import pickle
+import argparse
+from pathlib import Path
+from typing import Optional
+
+from discrete_world.grid import GridWorld
+
+
+def convert(env_file: Path, world_file: Optional[Path] = None) -> Path:
+    """Converts a pickled grid-world to the binary format.
+
+    Writes next to `env_file` with a `.world` suffix unless `world_file` is given.
+    """
+    with open(env_file, "rb") as data_file:
+        world = pickle.load(data_file)
+    if not isinstance(world, GridWorld):
+        raise ValueError("{} does not contain a GridWorld".format(env_file))
+
+    if world_file is None:
+        world_file = env_file.with_suffix(".world")
+    world.save(world_file)
+    return world_file
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert .env files to .world files")
+    parser.add_argument(
+        "env_files",
+        nargs="+",
+        type=lambda p: Path(p).absolute(),
+        help="Paths to pickled environment files",
+    )
+    args = parser.parse_args()
+
+    for env_file in args.env_files:
+        print("{} -> {}".format(env_file, convert(env_file)))
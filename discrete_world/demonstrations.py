@@ -0,0 +1,243 @@
+"""Generation of demonstrations for learning from demonstrations.
+
+A `DemonstrationGenerator` runs one breadth-first search per goal of its map and
+caches the resulting distance field, the BFS tree of the goal: from any cell, moving
+to a neighbor one step closer to the goal follows a shortest path. Every later query
+for that goal, from any start, reuses the tree. Demonstrations are generated many at
+once, advancing all of them by one step with array operations, and are returned as
+the compact `rollout.Trajectories` arrays.
+
+`path_actions` converts sequences of states, e.g. clicked in `design_obstacles`, to
+actions with array operations.
+"""
+from typing import Dict, List, Tuple, Union, Optional
+
+import numpy as np
+import numpy.random as npr
+
+from discrete_world.grid import (
+    ACTION_OFFSETS,
+    Actions,
+    GridWorld,
+    index_dtype,
+    _as_cells,
+)
+from discrete_world.rollout import Trajectories
+
+# Action of every (row, col) offset, as `_OFFSET_ACTIONS[d_row + 1, d_col + 1]`, with
+# -1 for the offsets that no action makes.
+_OFFSET_ACTIONS = np.full((3, 3), -1, dtype=np.int8)
+_OFFSET_ACTIONS[ACTION_OFFSETS[:, 0] + 1, ACTION_OFFSETS[:, 1] + 1] = np.arange(
+    len(Actions)
+)
+
+
+def path_actions(states: np.ndarray) -> np.ndarray:
+    """Actions that move between consecutive states of paths.
+
+    Args:
+        states: (..., T, 2) array of (row, col) states.
+
+    Returns:
+        (..., T - 1) `int8` array of `Actions`, with `NO_OP` for repeated states and
+        -1 for steps between states that are not neighbors.
+    """
+    states = np.asarray(states, dtype=np.int64)
+    offsets = states[..., 1:, :] - states[..., :-1, :]
+    adjacent = np.all(np.abs(offsets) <= 1, axis=-1)
+    offsets = np.where(adjacent[..., None], offsets, 1)  # (1, 1) has no action
+    return _OFFSET_ACTIONS[offsets[..., 0] + 1, offsets[..., 1] + 1]
+
+
+class DemonstrationGenerator:
+    """Shortest and near-shortest paths from a start to the goals of one map.
+
+    The BFS trees are cached for the map as it is when they are first used, so the
+    generator should be created again after the world is edited.
+    """
+
+    _world: GridWorld
+    _rng: npr.Generator
+    _trees: Dict[Optional[int], np.ndarray]  # (S,) distances, by flat goal index
+
+    def __init__(
+        self, world: GridWorld, seed: Optional[Union[int, npr.Generator]] = None
+    ):
+        """
+        Args:
+            world: The grid-world.
+            seed: Seed of the choices between equally short paths and of the
+                detours.
+        """
+        self._world = world
+        self._rng = npr.default_rng(seed)
+        self._trees = {}
+
+    @property
+    def world(self) -> GridWorld:
+        return self._world
+
+    def distances(self, goal: Optional[Tuple[int, int]] = None) -> np.ndarray:
+        """(S,) number of moves from every cell to `goal`, or to the nearest goal by
+        default, with -1 for obstacles and cells that cannot reach it.
+
+        Paths to `goal` avoid the other goals, where episodes would end.
+        """
+        world = self._world
+        key = None if goal is None else world.state_to_index(goal)
+        if key not in self._trees:
+            if goal is None:
+                tree = world.goal_distances.reshape(-1)
+            else:
+                passable = ~(world.obstacle_mask | world.goal_mask)
+                passable[tuple(goal)] = True
+                tree = world.distances_from([goal], passable).reshape(-1)
+            self._trees[key] = tree
+        return self._trees[key]
+
+    def _start_index(self, start: Optional[Tuple[int, int]]) -> int:
+        row, col = self._world.init_pos if start is None else start
+        return self._world.state_to_index((int(row), int(col)))
+
+    def _start(self, tree: np.ndarray, start: Optional[Tuple[int, int]]) -> int:
+        s = self._start_index(start)
+        if tree[s] < 0:
+            raise ValueError(
+                "The goal cannot be reached from {}".format(
+                    self._world.index_to_state(s)
+                )
+            )
+        return s
+
+    def shortest_path(
+        self,
+        start: Optional[Tuple[int, int]] = None,
+        goal: Optional[Tuple[int, int]] = None,
+    ) -> np.ndarray:
+        """(T, 2) states of a shortest path from `start` (default: `init_pos`) to
+        `goal` (default: the nearest goal), preferring actions in `Actions` order."""
+        tree = self.distances(goal)
+        moves = self._world.move_table
+        s = self._start(tree, start)
+        path = [s]
+        for distance in range(tree[s] - 1, -1, -1):
+            neighbors = moves[s, : Actions.NO_OP]
+            s = int(neighbors[np.argmax(tree[neighbors] == distance)])
+            path.append(s)
+        return self._world.index_to_state(np.array(path))
+
+    def generate(
+        self,
+        n: int,
+        start: Optional[Tuple[int, int]] = None,
+        goal: Optional[Tuple[int, int]] = None,
+        epsilon: float = 0.0,
+        max_steps: Optional[int] = None,
+    ) -> Trajectories:
+        """Generates `n` demonstrations from `start` to `goal`.
+
+        Every step moves to a neighbor one move closer to the goal, chosen uniformly
+        among the equally close ones, so that the demonstrations cover the different
+        shortest paths. With probability `epsilon`, a step is instead a detour to a
+        uniformly chosen non-obstacle neighbor from which the goal can be reached,
+        which gives near-optimal demonstrations. The steps are deterministic, without
+        the slips of the world.
+
+        Args:
+            n: Number of demonstrations.
+            start: Start of the demonstrations, `init_pos` by default.
+            goal: The goal, by default the nearest goal of every state.
+            epsilon: Probability of a detour at every step.
+            max_steps: Demonstrations are cut after this many steps. Defaults to
+                the shortest path length when `epsilon` is 0, and 4 times it
+                otherwise.
+
+        Returns:
+            The demonstrations, where `dones` tells whether they reached the goal.
+        """
+        world = self._world
+        tree = self.distances(goal)
+        s = self._start(tree, start)
+        if max_steps is None:
+            max_steps = int(tree[s]) * (4 if epsilon > 0 else 1)
+        moves = world.move_table[:, : Actions.NO_OP]
+        rng = self._rng
+
+        # Steps of the running demonstrations, concatenated at the end
+        step_episodes, step_states, step_actions = [], [], []
+        pos = np.full(n, s, dtype=np.int64)
+        running = np.arange(n) if tree[s] > 0 else np.arange(0)
+        for _ in range(max_steps):
+            if len(running) == 0:
+                break
+            p = pos[running]
+            neighbors = moves[p]  # (m, 4)
+            distances = tree[neighbors]
+            allowed = distances == (tree[p] - 1)[:, None]
+            if epsilon > 0:
+                detour = rng.random(len(p)) < epsilon
+                reachable = (distances >= 0) & (neighbors != p[:, None])
+                allowed = np.where(detour[:, None], reachable, allowed)
+            # Uniform choice among the allowed actions
+            a = np.argmax(allowed * rng.random(allowed.shape), axis=-1)
+
+            step_episodes.append(running)
+            step_states.append(p)
+            step_actions.append(a)
+            pos[running] = neighbors[np.arange(len(p)), a]
+            running = running[tree[pos[running]] > 0]
+
+        if step_episodes:
+            episodes = np.concatenate(step_episodes)
+            states = np.concatenate(step_states)
+            actions = np.concatenate(step_actions)
+        else:
+            episodes = states = actions = np.zeros(0, dtype=np.int64)
+        # Steps are recorded step by step; a stable sort groups them by episode
+        order = np.argsort(episodes, kind="stable")
+        states, actions = states[order], actions[order]
+        next_states = moves[states, actions]
+
+        rewards = world.reward_vector[next_states]
+        if world.reward_function is not None:
+            rewards = rewards + world.reward_function(states, actions, next_states)
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(episodes, minlength=n), out=offsets[1:])
+        dtype = index_dtype(world.n_states)
+        return Trajectories(
+            states=states.astype(dtype),
+            actions=actions.astype(np.int8),
+            rewards=rewards.astype(np.float32),
+            next_states=next_states.astype(dtype),
+            offsets=offsets,
+            dones=tree[pos] == 0,
+        )
+
+    def generate_per_goal(
+        self,
+        n_per_goal: int,
+        start: Optional[Tuple[int, int]] = None,
+        epsilon: float = 0.0,
+        max_steps: Optional[int] = None,
+    ) -> Tuple[Trajectories, np.ndarray]:
+        """Generates `n_per_goal` demonstrations to every goal that can be reached
+        from `start`.
+
+        Returns:
+            The demonstrations, grouped by goal, and the (E, 2) goal of every
+            demonstration.
+        """
+        rows, cols = _as_cells(sorted(self._world.goals))
+        parts = []  # type: List[Trajectories]
+        goals = []
+        for goal in zip(rows.tolist(), cols.tolist()):
+            if self.distances(goal)[self._start_index(start)] < 0:
+                continue
+            parts.append(self.generate(n_per_goal, start, goal, epsilon, max_steps))
+            goals.append(goal)
+        if not parts:
+            raise ValueError("No goal can be reached")
+        return (
+            Trajectories.concatenate(parts),
+            np.repeat(np.array(goals, dtype=np.int64), n_per_goal, axis=0),
+        )
@@ -0,0 +1,307 @@
+"""Gym environments around `GridWorld` and `BatchedGridWorld`.
+
+Importing `discrete_world` registers `GridWorldEnv` as "DiscreteWorld-v0":
+
+    env = gym.make("DiscreteWorld-v0", rows=16, cols=16, kind="maze", seed=0)
+
+`GridWorldVectorEnv` is a `gym.vector.VectorEnv` that steps all its environments with
+the array operations of `BatchedGridWorld`, instead of looping over single
+environments like `gym.vector.SyncVectorEnv`.
+
+Both follow the API of gym 0.26 and Gymnasium: `reset(seed=None, options=None)`
+returns `(observation, info)` and `step` returns `(observation, reward, terminated,
+truncated, info)`. Episodes end in goals and obstacles, which terminates them, and
+are only truncated by the `max_episode_steps` of the registered environment.
+
+`check_vector_env` steps a vector environment until an episode ends, as a quick check
+of the automatic resets and final observations.
+"""
+import pickle
+from pathlib import Path
+from typing import Any, Dict, List, Tuple, Union, Optional
+
+import gym
+import numpy as np
+from gym.spaces import Discrete, Space
+from gym.vector import VectorEnv
+
+from discrete_world.grid import GridWorld
+from discrete_world.vector import BatchedGridWorld
+
+ENV_ID = "DiscreteWorld-v0"
+OBSERVATIONS = ("multidiscrete", "flat")
+
+
+def _make_world(
+    world: Optional[GridWorld], filepath: Optional[Union[str, Path]], **params
+) -> GridWorld:
+    """`world`, the world saved in `filepath`, or a generated world."""
+    if world is not None:
+        return world
+    if filepath is not None:
+        if Path(filepath).suffix == ".world":
+            return GridWorld.load(filepath)
+        with open(filepath, "rb") as data_file:
+            return pickle.load(data_file)
+    # Imported here, as the generator is only needed for generated worlds
+    from discrete_world.generate import generate_world
+
+    return generate_world(**params)
+
+
+def _observation_space(world: GridWorld, observation: str) -> Space:
+    if observation not in OBSERVATIONS:
+        raise ValueError(
+            "Unknown observation {}. Expected one of {}".format(
+                observation, ", ".join(OBSERVATIONS)
+            )
+        )
+    if observation == "flat":
+        return Discrete(world.n_states)
+    return world.observation_space
+
+
+class GridWorldEnv(gym.Env):
+    """Single grid-world as a `gym.Env`.
+
+    Observations are the (row, col) position of the agent as an array of a
+    `MultiDiscrete` space, or its flat index `row * cols + col` of a `Discrete`
+    space with `observation="flat"`. The `info` of `step` has the action executed
+    after slipping.
+    """
+
+    metadata = {"render_modes": ["human", "ansi", "rgb_array"], "render_fps": 4}
+
+    def __init__(
+        self,
+        world: Optional[GridWorld] = None,
+        filepath: Optional[Union[str, Path]] = None,
+        observation: str = "multidiscrete",
+        fast_step: bool = True,
+        render_mode: Optional[str] = None,
+        **params
+    ):
+        """
+        Args:
+            world: The grid-world to wrap. The environment steps this world itself,
+                not a copy.
+            filepath: Without `world`, a `.world` or pickled `.env` file to load.
+            observation: "multidiscrete" or "flat".
+            fast_step: Whether to step the world with `GridWorld.enable_fast_step`.
+                This enables the fast path on a given `world`, which changes the
+                trajectories of its later seeded `step` calls outside the
+                environment too.
+            render_mode: "human", "ansi" or "rgb_array", the output of `render`.
+            params: Without `world` or `filepath`, the arguments of
+                `discrete_world.generate.generate_world`, e.g. `rows`, `cols`,
+                `kind`, `p_slip` and `seed`.
+        """
+        if render_mode is not None and render_mode not in self.metadata["render_modes"]:
+            raise ValueError("Unknown render mode {}".format(render_mode))
+        self.render_mode = render_mode
+        self.world = _make_world(world, filepath, **params)
+        self.observation = observation
+        self.observation_space = _observation_space(self.world, observation)
+        self.action_space = self.world.action_space
+        if fast_step:
+            self.world.enable_fast_step()
+
+    def _observe(self) -> Union[int, np.ndarray]:
+        # Read from the world, so that its `flat_states` mode does not matter
+        idx = self.world.current_index
+        if self.observation == "flat":
+            return idx
+        return np.array(divmod(idx, self.world.cols), dtype=np.int64)
+
+    def reset(
+        self, *, seed: Optional[int] = None, options: Optional[Dict[str, Any]] = None
+    ) -> Tuple[Union[int, np.ndarray], Dict[str, Any]]:
+        """Resets the world, and seeds its slips and the action space with `seed`."""
+        super().reset(seed=seed)
+        if seed is not None:
+            self.world.seed(seed)
+            self.action_space.seed(seed)
+        self.world.reset()
+        return self._observe(), {}
+
+    def step(
+        self, action: int
+    ) -> Tuple[Union[int, np.ndarray], float, bool, bool, Dict[str, Any]]:
+        _, reward, done = self.world.step(action)
+        info = {"executed_action": int(self.world.last_action)}
+        return (self._observe(), reward, bool(done), False, info)
+
+    def render(self) -> Any:
+        """The text of the world for "ansi", its RGB frame for "rgb_array", and None
+        after printing it for "human"."""
+        if self.render_mode == "rgb_array":
+            return self.world.render(self.render_mode)
+        if self.render_mode is None:
+            return None
+        text = self.world.render()
+        if self.render_mode == "ansi":
+            return text
+        print(text)
+        return None
+
+
+class GridWorldVectorEnv(VectorEnv):
+    """`num_envs` copies of a grid-world as one `gym.vector.VectorEnv`.
+
+    Environments whose episode is done are reset automatically, and like with the
+    other vector environments of gym, the observation returned for them is the
+    first one of their new episode. Their last observations are in the
+    "final_observation" entry of the infos, where "_final_observation" masks them.
+    """
+
+    metadata = {"render_modes": ["rgb_array"], "render_fps": 4}
+    render_mode = "rgb_array"
+
+    def __init__(
+        self,
+        num_envs: int,
+        world: Optional[GridWorld] = None,
+        filepath: Optional[Union[str, Path]] = None,
+        observation: str = "multidiscrete",
+        seed: Optional[int] = None,
+        **params
+    ):
+        """
+        Args:
+            num_envs: Number of environments.
+            world, filepath, observation, params: See `GridWorldEnv`.
+            seed: Seed of the slips of all environments, which `reset` can also
+                set.
+        """
+        world = _make_world(world, filepath, **params)
+        self.observation = observation
+        self.batch = BatchedGridWorld(world, num_envs, seed=seed, auto_reset=True)
+        super().__init__(
+            num_envs, _observation_space(world, observation), world.action_space
+        )
+        self._actions = None  # type: Optional[np.ndarray]
+
+    @property
+    def world(self) -> GridWorld:
+        return self.batch.world
+
+    def _observe(self, states: np.ndarray) -> np.ndarray:
+        if self.observation == "flat":
+            return self.world.state_to_index(states)
+        return states
+
+    def reset_async(
+        self,
+        seed: Optional[Union[int, List[int]]] = None,
+        options: Optional[Dict[str, Any]] = None,
+    ):
+        pass
+
+    def reset_wait(
+        self,
+        seed: Optional[Union[int, List[int]]] = None,
+        options: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """Resets all environments, and seeds their slips with `seed`.
+
+        The environments share one RNG, so a list of seeds is seeded with its first
+        seed only.
+        """
+        if isinstance(seed, (list, tuple)):
+            seed = seed[0]
+        if seed is not None:
+            self.batch.seed(seed)
+            self.action_space.seed(seed)
+        return self._observe(self.batch.reset()), {}
+
+    def step_async(self, actions: np.ndarray):
+        self._actions = np.asarray(actions)
+
+    def step_wait(
+        self, **kwargs
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, Dict[str, Any]]:
+        if self._actions is None:
+            raise ValueError("step_async must be called before step_wait")
+        next_states, rewards, dones = self.batch.step(self._actions)
+        self._actions = None
+
+        # Like gym.vector.SyncVectorEnv, the last observations of the environments
+        # that were reset, with a mask of these environments
+        infos = {}  # type: Dict[str, Any]
+        if dones.any():
+            # Filled one by one, as an array of (2,) observations would not fit
+            final = np.empty(self.num_envs, dtype=object)
+            terminal = self._observe(next_states[dones])
+            for i, observation in zip(np.flatnonzero(dones).tolist(), terminal):
+                final[i] = observation
+            infos["final_observation"] = final
+            infos["_final_observation"] = dones.copy()
+        observations = self._observe(self.batch.current_states)
+        truncated = np.zeros(self.num_envs, dtype=bool)
+        return (observations, rewards.astype(np.float32), dones, truncated, infos)
+
+    def render(self) -> Any:
+        """(num_envs, height, width, 3) RGB frames of all environments."""
+        return self.batch.render()
+
+    def close_extras(self, **kwargs):
+        pass
+
+
+def register():
+    """Registers `GridWorldEnv` as `ENV_ID`, unless it already is registered."""
+    registry = gym.envs.registration.registry
+    specs = getattr(registry, "env_specs", registry)
+    if ENV_ID not in specs:
+        gym.envs.registration.register(
+            id=ENV_ID,
+            entry_point="discrete_world.env:GridWorldEnv",
+            max_episode_steps=200,
+        )
+
+
+def check_vector_env(
+    observation: str = "multidiscrete",
+    num_envs: int = 16,
+    max_steps: int = 1000,
+    seed: int = 0,
+    **params
+) -> int:
+    """Steps a `GridWorldVectorEnv` with random actions until an environment finishes,
+    and checks its final observations.
+
+    Args:
+        observation: Observation of the environments, see `GridWorldEnv`.
+        num_envs: Number of environments.
+        max_steps: Number of steps after which the check fails.
+        seed: Seed of the world, the slips and the actions.
+        params: Arguments of `discrete_world.generate.generate_world`.
+
+    Returns:
+        The number of steps until the first environment finished.
+    """
+    # Imported here, as the generator is only needed for generated worlds
+    from discrete_world.generate import generate_world
+
+    world = generate_world(
+        **dict(dict(rows=8, cols=8, p_slip=0.2, seed=seed), **params)
+    )
+    env = GridWorldVectorEnv(num_envs, world, observation=observation, seed=seed)
+    single_space = _observation_space(env.world, observation)
+    env.reset(seed=seed)
+    for step in range(1, max_steps + 1):
+        _, _, terminated, truncated, infos = env.step(env.action_space.sample())
+        if not terminated.any():
+            continue
+        if not np.array_equal(infos["_final_observation"], terminated):
+            raise ValueError("The final observations do not mask the finished envs")
+        for i, final in enumerate(infos["final_observation"]):
+            if terminated[i] != (final is not None):
+                raise ValueError("Missing final observation of env {}".format(i))
+            if final is not None and not single_space.contains(final):
+                raise ValueError("Invalid final observation {}".format(final))
+        return step
+    raise ValueError("No environment finished in {} steps".format(max_steps))
+
+
+register()
@@ -0,0 +1,200 @@
+"""Evaluation of fixed policies by Monte Carlo simulation, with an exact cross-check.
+
+`evaluate_policy` simulates batches of episodes from `init_pos` in parallel, with one
+array operation per step for all running episodes, and stops as soon as the
+confidence intervals of the success and collision rates are tight enough. An episode
+is a success when it enters a goal, and a collision when it enters an obstacle.
+
+`exact_evaluation` computes the same quantities without sampling, by solving the
+linear equations of the absorbing Markov chain that the policy induces on the world
+(see `discrete_world.analysis`).
+With a long enough `max_steps`, the Monte Carlo estimates should fall within their
+confidence intervals of the exact values.
+
+Policies are (S,) arrays of actions or (S, A) arrays of action probabilities over
+flat state indices, as for `rollout.collect_rollouts`.
+"""
+from typing import Union, Optional, NamedTuple
+
+import numpy as np
+import numpy.random as npr
+
+from discrete_world.grid import GridWorld
+
+
+class EvaluationResult(NamedTuple):
+    """Statistics of the episodes of a policy.
+
+    The `*_ci` fields are the half-widths of the confidence intervals.
+    """
+
+    n_episodes: int
+    success_rate: float
+    success_ci: float
+    collision_rate: float
+    collision_ci: float
+    timeout_rate: float  # episodes cut after `max_steps` steps
+    mean_return: float
+    return_ci: float
+    mean_length: float
+    converged: bool  # whether the intervals got within the tolerances
+
+
+class ExactEvaluation(NamedTuple):
+    """Exact statistics of a policy from `init_pos`, over unbounded episodes."""
+
+    success_prob: float
+    collision_prob: float
+    expected_return: float
+    expected_length: float
+
+
+def _action_table(policy: np.ndarray, n_states: int, n_actions: int) -> np.ndarray:
+    """(S,) actions, or (S, A) cumulative action probabilities to sample from."""
+    policy = np.asarray(policy)
+    if policy.shape == (n_states,):
+        return policy.astype(np.int64)
+    if policy.shape != (n_states, n_actions):
+        raise ValueError(
+            "Expected a ({},) or ({}, {}) policy. Got {}".format(
+                n_states, n_states, n_actions, policy.shape
+            )
+        )
+    cumulative = np.cumsum(policy, axis=-1, dtype=float)
+    if not np.allclose(cumulative[:, -1], 1.0):
+        raise ValueError("The action probabilities of every state must sum to 1")
+    return cumulative / cumulative[:, -1:]
+
+
+def _rate_interval(hits: int, n: int, z: float) -> float:
+    """Half-width of the Agresti-Coull interval of a rate, which stays wide for
+    rates of 0 or 1 after few episodes."""
+    n_adjusted = n + z * z
+    p = (hits + 0.5 * z * z) / n_adjusted
+    return z * np.sqrt(p * (1 - p) / n_adjusted)
+
+
+def evaluate_policy(
+    world: GridWorld,
+    policy: np.ndarray,
+    max_steps: int = 200,
+    tol: float = 0.01,
+    return_tol: Optional[float] = None,
+    z: float = 1.96,
+    batch_size: int = 1024,
+    max_episodes: int = 1000000,
+    gamma: float = 1.0,
+    seed: Optional[Union[int, npr.Generator]] = None,
+) -> EvaluationResult:
+    """Estimates the success, collision and return statistics of a policy.
+
+    Episodes start at `init_pos` and follow the dynamics of `world.transition_model`,
+    so they include the slips and the rewards of `world.reward_function`. They are
+    simulated `batch_size` at a time until the confidence intervals are within the
+    tolerances, or `max_episodes` episodes were simulated.
+
+    Args:
+        world: The grid-world.
+        policy: (S,) actions or (S, A) action probabilities.
+        max_steps: Episodes that have not terminated after this many steps are cut.
+        tol: Largest half-width of the intervals of the success and collision rates.
+        return_tol: Largest half-width of the interval of the mean return, if given.
+        z: z-score of the intervals, 1.96 for 95% intervals.
+        batch_size: Number of episodes simulated at once.
+        max_episodes: Maximum number of episodes.
+        gamma: Discount factor of the returns.
+        seed: Seed of the slips and of the actions of stochastic policies.
+    """
+    model = world.transition_model
+    n_states, n_actions, _ = model.next_states.shape
+    table = _action_table(policy, n_states, n_actions)
+    rng = npr.default_rng(seed)
+    goals = world.goal_mask.reshape(-1)
+    obstacles = world.obstacle_mask.reshape(-1)
+    p_slip = world.p_slip
+    start = world.state_to_index(world.init_pos)
+
+    n = successes = collisions = timeouts = 0
+    return_sum = return_sq_sum = length_sum = 0.0
+    converged = False
+    while n < max_episodes and not converged:
+        m = min(batch_size, max_episodes - n)
+        returns = np.zeros(m)
+        lengths = np.full(m, max_steps)
+
+        # Running episodes and their states; finished episodes are dropped
+        episodes = np.arange(m)
+        pos = np.full(m, start, dtype=np.int64)
+        discount = 1.0
+        for t in range(max_steps):
+            if table.ndim == 1:
+                actions = table[pos]
+            else:
+                u = rng.random(len(pos))
+                actions = (table[pos] < u[:, None]).sum(axis=-1)
+                actions = np.minimum(actions, n_actions - 1)
+            u = rng.random(len(pos))
+            outcomes = np.where(u < p_slip, np.where(u < 0.5 * p_slip, 1, 2), 0)
+
+            returns[episodes] += discount * model.rewards[pos, actions, outcomes]
+            pos = model.next_states[pos, actions, outcomes].astype(np.int64)
+            discount *= gamma
+
+            done = model.terminal[pos]
+            if done.any():
+                successes += int(goals[pos[done]].sum())
+                collisions += int(obstacles[pos[done]].sum())
+                lengths[episodes[done]] = t + 1
+                episodes, pos = episodes[~done], pos[~done]
+                if len(pos) == 0:
+                    break
+        timeouts += len(pos)
+
+        n += m
+        return_sum += returns.sum()
+        return_sq_sum += np.square(returns).sum()
+        length_sum += lengths.sum()
+
+        mean_return = return_sum / n
+        variance = max(return_sq_sum / n - mean_return ** 2, 0.0)
+        return_ci = z * np.sqrt(variance / n)
+        success_ci = _rate_interval(successes, n, z)
+        collision_ci = _rate_interval(collisions, n, z)
+        converged = max(success_ci, collision_ci) <= tol and (
+            return_tol is None or return_ci <= return_tol
+        )
+
+    return EvaluationResult(
+        n_episodes=n,
+        success_rate=successes / n,
+        success_ci=float(success_ci),
+        collision_rate=collisions / n,
+        collision_ci=float(collision_ci),
+        timeout_rate=timeouts / n,
+        mean_return=float(mean_return),
+        return_ci=float(return_ci),
+        mean_length=float(length_sum / n),
+        converged=bool(converged),
+    )
+
+
+def exact_evaluation(
+    world: GridWorld, policy: np.ndarray, gamma: float = 1.0
+) -> ExactEvaluation:
+    """Success and collision probabilities, expected return and expected length of
+    the episodes of a policy from `init_pos`, from `analysis.analyze_policy`.
+
+    Episodes that never reach a goal or obstacle count as neither a success nor a
+    collision. With `gamma=1`, the expected return is NaN and the expected length
+    inf when the episode may go on forever.
+    """
+    # Imported here, as the analysis needs scipy
+    from discrete_world.analysis import analyze_policy
+
+    analysis = analyze_policy(world, policy, gamma).at(world, world.init_pos)
+    return ExactEvaluation(
+        success_prob=float(analysis.goal_probs),
+        collision_prob=float(analysis.obstacle_probs),
+        expected_return=float(analysis.values),
+        expected_length=float(analysis.expected_steps),
+    )
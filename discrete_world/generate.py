@@ -0,0 +1,231 @@
+"""Procedural generation of grid-world maps.
+
+Maps are generated in batches as (N, rows, cols) `uint8` arrays of `States`, one map
+per leading index, with NumPy operations over the whole batch. Every map has its
+start and goal connected: maps where the goal cannot be reached from the start get
+a monotone path carved between them.
+
+Generation only depends on the seed and the arguments, so datasets are reproducible:
+
+    grids = generate_grids(1000, 32, 32, kind="maze", seed=0)
+    world = generate_world(32, 32, kind="rooms", p_slip=0.1, seed=1)
+"""
+from typing import List, Tuple, Union, Optional
+
+import numpy as np
+import numpy.random as npr
+
+from discrete_world.grid import GridWorld, States
+
+
+def random_obstacles(
+    n: int, rows: int, cols: int, rng: npr.Generator, density: float = 0.2
+) -> np.ndarray:
+    """(N, rows, cols) obstacle masks where every cell is an obstacle with
+    probability `density`."""
+    if not 0 <= density <= 1:
+        raise ValueError("Density needs to be in [0, 1]. Got {}".format(density))
+    return rng.random((n, rows, cols)) < density
+
+
+def maze_obstacles(n: int, rows: int, cols: int, rng: npr.Generator) -> np.ndarray:
+    """(N, rows, cols) obstacle masks of binary tree mazes.
+
+    The cells with even row and column are the rooms of the maze. Each room opens
+    the wall above it or to its right at random, which connects all the rooms
+    without loops.
+    """
+    obstacles = np.ones((n, rows, cols), dtype=bool)
+    obstacles[:, ::2, ::2] = False
+    room_rows, room_cols = (rows + 1) // 2, (cols + 1) // 2
+
+    up = rng.random((n, room_rows, room_cols)) < 0.5
+    up[:, 0, :] = False  # the top rooms can only open to the right,
+    up[:, :, -1] = True  # and the rightmost rooms can only open up
+    b, i, j = np.nonzero(up[:, 1:, :])
+    obstacles[b, 2 * i + 1, 2 * j] = False
+    b, i, j = np.nonzero(~up)
+    obstacles[b, 2 * i, 2 * j + 1] = False
+    return obstacles
+
+
+def room_obstacles(
+    n: int,
+    rows: int,
+    cols: int,
+    rng: npr.Generator,
+    room_size: int = 8,
+    p_door: float = 0.25,
+) -> np.ndarray:
+    """(N, rows, cols) obstacle masks of rooms separated by one-cell walls.
+
+    The rooms are `room_size` cells wide and connected by one-cell doors at random
+    places in the walls between them. Like in `maze_obstacles`, every room has a
+    door up or to the right, so all rooms are connected. Every other wall gets a
+    door with probability `p_door`, which adds loops.
+    """
+    if room_size < 1:
+        raise ValueError("Room size must be >= 1. Got {}".format(room_size))
+    pitch = room_size + 1
+    obstacles = np.zeros((n, rows, cols), dtype=bool)
+    obstacles[:, room_size::pitch, :] = True
+    obstacles[:, :, room_size::pitch] = True
+    room_rows, room_cols = -(-rows // pitch), -(-cols // pitch)
+
+    # Cells spanned by every row and column of rooms
+    row_spans = np.minimum(room_size, rows - np.arange(room_rows) * pitch)
+    col_spans = np.minimum(room_size, cols - np.arange(room_cols) * pitch)
+
+    up = rng.random((n, room_rows, room_cols)) < 0.5
+    up[:, 0, :] = False
+    up[:, :, -1] = True
+    shape = (n, room_rows, room_cols)
+    door_up = up | (rng.random(shape) < p_door)
+    door_right = ~up | (rng.random(shape) < p_door)
+    door_up[:, 0, :] = False
+    door_right[:, :, -1] = False
+
+    # Random offset of every door along its wall
+    col_offsets = (rng.random(shape) * col_spans[None, None, :]).astype(np.int64)
+    row_offsets = (rng.random(shape) * row_spans[None, :, None]).astype(np.int64)
+    b, i, j = np.nonzero(door_up)
+    obstacles[b, i * pitch - 1, j * pitch + col_offsets[b, i, j]] = False
+    b, i, j = np.nonzero(door_right)
+    obstacles[b, i * pitch + row_offsets[b, i, j], (j + 1) * pitch - 1] = False
+    return obstacles
+
+
+GENERATORS = {
+    "random": random_obstacles,
+    "maze": maze_obstacles,
+    "rooms": room_obstacles,
+}
+
+
+def reachable(free: np.ndarray, start: Tuple[int, int]) -> np.ndarray:
+    """(N, rows, cols) masks of the free cells that can be reached from `start`.
+
+    Runs a breadth-first search on all maps at once, by growing the reached cells
+    by one step per iteration, and stops growing a map once it stops changing.
+    """
+    reached = np.zeros_like(free)
+    reached[:, start[0], start[1]] = free[:, start[0], start[1]]
+    active = np.arange(len(free))
+    while len(active):
+        old = reached[active]
+        new = old.copy()
+        new[:, 1:, :] |= old[:, :-1, :]
+        new[:, :-1, :] |= old[:, 1:, :]
+        new[:, :, 1:] |= old[:, :, :-1]
+        new[:, :, :-1] |= old[:, :, 1:]
+        new &= free[active]
+        reached[active] = new
+        active = active[np.any(new != old, axis=(1, 2))]
+    return reached
+
+
+def _monotone_path(start: Tuple[int, int], goal: Tuple[int, int]) -> np.ndarray:
+    """(L, 2) cells of a path from `start` along its column to the row of `goal`, and
+    then along that row to `goal`."""
+    (r0, c0), (r1, c1) = start, goal
+    dr = 1 if r1 >= r0 else -1
+    dc = 1 if c1 >= c0 else -1
+    rows = np.arange(r0, r1 + dr, dr)
+    cols = np.arange(c0, c1 + dc, dc)
+    return np.concatenate(
+        [
+            np.stack([rows, np.full_like(rows, c0)], axis=-1),
+            np.stack([np.full_like(cols, r1), cols], axis=-1),
+        ]
+    )
+
+
+def generate_grids(
+    n: int,
+    rows: int,
+    cols: int,
+    kind: str = "random",
+    init_pos: Optional[Tuple[int, int]] = None,
+    goal: Optional[Tuple[int, int]] = None,
+    seed: Optional[Union[int, npr.SeedSequence, npr.Generator]] = None,
+    **params
+) -> np.ndarray:
+    """Generates `n` maps with a start and a goal that are connected.
+
+    Args:
+        n: Number of maps.
+        rows, cols: Size of the maps.
+        kind: Name of the obstacle generator in `GENERATORS`.
+        init_pos: Start of the agent, defaults to the bottom left corner.
+        goal: Goal, defaults to the top right corner.
+        seed: Seed of the generator.
+        params: Parameters of the obstacle generator, e.g. `density` of "random"
+            maps or `room_size` and `p_door` of "rooms" maps.
+
+    Returns:
+        (n, rows, cols) `uint8` array of `States`.
+    """
+    if kind not in GENERATORS:
+        raise ValueError(
+            "Unknown kind of map {}. Expected one of {}".format(
+                kind, ", ".join(GENERATORS)
+            )
+        )
+    start_row, start_col = (rows - 1, 0) if init_pos is None else init_pos
+    goal_row, goal_col = (0, cols - 1) if goal is None else goal
+    start = (int(start_row), int(start_col))
+    target = (int(goal_row), int(goal_col))
+    rng = npr.default_rng(seed)
+
+    obstacles = GENERATORS[kind](n, rows, cols, rng, **params)
+    obstacles[:, start[0], start[1]] = False
+    obstacles[:, target[0], target[1]] = False
+
+    # Carve a path in the maps where the goal cannot be reached
+    cut = ~reachable(~obstacles, start)[:, target[0], target[1]]
+    if cut.any():
+        path = _monotone_path(start, target)
+        obstacles[np.flatnonzero(cut)[:, None], path[:, 0], path[:, 1]] = False
+
+    grids = np.where(obstacles, States.OBSTACLE, States.EMPTY).astype(np.uint8)
+    grids[:, start[0], start[1]] = States.START
+    grids[:, target[0], target[1]] = States.GOAL
+    return grids
+
+
+def generate_worlds(
+    n: int,
+    rows: int,
+    cols: int,
+    kind: str = "random",
+    p_slip: float = 0.1,
+    init_pos: Optional[Tuple[int, int]] = None,
+    goal: Optional[Tuple[int, int]] = None,
+    seed: Optional[Union[int, npr.SeedSequence, npr.Generator]] = None,
+    **params
+) -> List[GridWorld]:
+    """Generates `n` grid-worlds with `generate_grids`.
+
+    The worlds are backed by slices of one (n, rows, cols) array.
+    """
+    row, col = (rows - 1, 0) if init_pos is None else init_pos
+    start = (int(row), int(col))
+    grids = generate_grids(n, rows, cols, kind, start, goal, seed, **params)
+    return [GridWorld.from_grid(grid, start, p_slip) for grid in grids]
+
+
+def generate_world(
+    rows: int,
+    cols: int,
+    kind: str = "random",
+    p_slip: float = 0.1,
+    init_pos: Optional[Tuple[int, int]] = None,
+    goal: Optional[Tuple[int, int]] = None,
+    seed: Optional[Union[int, npr.SeedSequence, npr.Generator]] = None,
+    **params
+) -> GridWorld:
+    """Generates one grid-world. See `generate_grids`."""
+    worlds = generate_worlds(
+        1, rows, cols, kind, p_slip, init_pos, goal, seed, **params
+    )
+    return worlds[0]
@@ -1,9 +1,26 @@
 import enum
+import json
 import pickle
-from typing import Set, List, Tuple, Union, Iterable, Optional
+import struct
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Set,
+    Dict,
+    List,
+    Tuple,
+    Union,
+    Iterable,
+    NamedTuple,
+    Optional,
+    cast,
+    overload,
+)
 
+import numpy as np
 import numpy.random as npr
-from gym.spaces import Discrete
+from gym.spaces import Discrete, MultiDiscrete
 
 
 @enum.unique
@@ -25,24 +42,171 @@ class Actions(enum.IntEnum):
     NO_OP = 4
 
 
+# The members of `Actions`, indexed by their integer value.
+_ACTIONS = tuple(Actions)
+N_ACTIONS = len(_ACTIONS)
+
+# Index of the outcome (see `TransitionModel`) of choosing an action and executing
+# another one, as `_OUTCOMES[chosen][executed]`.
+_OUTCOMES = [
+    {a: 0, (a - 1) % N_ACTIONS: 1, (a + 1) % N_ACTIONS: 2} for a in range(N_ACTIONS)
+]
+
+# (row, col) offset of each action, indexed by the integer value of `Actions`.
+ACTION_OFFSETS = np.array([[-1, 0], [0, 1], [1, 0], [0, -1], [0, 0]], dtype=np.int64)
+
+# Number of possible outcomes of an action: the action itself and the two actions it
+# can slip to (see `GridWorld.choose_action`).
+N_OUTCOMES = 3
+
+
+class TransitionModel(NamedTuple):
+    """Compact transition model over flat state indices.
+
+    For every state `s` and action `a`, the `k`-th outcome moves the agent to
+    `next_states[s, a, k]` with probability `probs[s, a, k]` and gives the reward
+    `rewards[s, a, k]`. Outcome 0 is the chosen action, outcomes 1 and 2 are the
+    slips to `(a - 1) % 5` and `(a + 1) % 5`. States in `terminal` end the episode.
+    """
+
+    next_states: np.ndarray  # (S, A, K) int
+    probs: np.ndarray  # (S, A, K) float
+    rewards: np.ndarray  # (S, A, K) float
+    terminal: np.ndarray  # (S,) bool
+
+    def to_csr(self) -> List:
+        """Returns one (S, S) `scipy.sparse.csr_matrix` of P(s' | s, a) per action.
+
+        Every row has at most K non-zeros, so the memory grows linearly with S.
+        """
+        try:
+            from scipy import sparse
+        except ImportError as e:
+            raise ImportError("Sparse transition matrices require scipy") from e
+
+        n_states, n_actions, n_outcomes = self.next_states.shape
+        indptr = np.arange(0, n_states * n_outcomes + 1, n_outcomes)
+        matrices = []
+        for a in range(n_actions):
+            P = sparse.csr_matrix(
+                (
+                    np.ascontiguousarray(self.probs[:, a]).reshape(-1),
+                    self.next_states[:, a].reshape(-1),
+                    indptr,
+                ),
+                shape=(n_states, n_states),
+            )
+            P.sum_duplicates()  # e.g. both slips of a corner state stay in place
+            matrices.append(P)
+        return matrices
+
+
+def index_dtype(n: int) -> np.dtype:
+    """Smallest integer type for flat indices into `n` states."""
+    return np.dtype(np.int32) if n <= np.iinfo(np.int32).max else np.dtype(np.int64)
+
+
+# Binary world format: the magic bytes, a little-endian uint16 format version and
+# uint32 header length, a JSON header, and the raw (rows, cols) uint8 grid starting
+# at the next multiple of `_WORLD_ALIGNMENT` bytes so that it can be memory-mapped.
+WORLD_MAGIC = b"DWORLD"
+WORLD_VERSION = 1
+_WORLD_PREFIX = struct.Struct("<HI")
+_WORLD_ALIGNMENT = 64
+
+
+def read_world_header(filepath: Union[str, Path]) -> Dict[str, Any]:
+    """Reads the header of a binary world file without reading its grid.
+
+    The header has the `version`, `rows`, `cols`, `init_pos` and `p_slip` of the
+    world, and the byte `offset` of the grid in the file.
+    """
+    with open(filepath, "rb") as data_file:
+        magic = data_file.read(len(WORLD_MAGIC))
+        if magic != WORLD_MAGIC:
+            raise ValueError("{} is not a binary world file".format(filepath))
+        version, header_len = _WORLD_PREFIX.unpack(
+            data_file.read(_WORLD_PREFIX.size)
+        )
+        if version > WORLD_VERSION:
+            raise ValueError(
+                "{} has format version {}, but only versions up to {} are "
+                "supported".format(filepath, version, WORLD_VERSION)
+            )
+        header = json.loads(data_file.read(header_len).decode("utf-8"))
+
+    end = len(WORLD_MAGIC) + _WORLD_PREFIX.size + header_len
+    header["version"] = version
+    header["offset"] = -(-end // _WORLD_ALIGNMENT) * _WORLD_ALIGNMENT
+    return header
+
+
+def _as_cells(cells: Iterable[Tuple[int, int]]) -> Tuple[np.ndarray, np.ndarray]:
+    """(rows, cols) index arrays of an iterable of positions or an (N, 2) array."""
+    if not isinstance(cells, np.ndarray):
+        cells = np.array(list(cells))
+    array = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+    return array[:, 0], array[:, 1]
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+# Reward of entering a cell of each kind, see `GridWorld._initialize_rewards`.
+_CELL_REWARDS = {States.GOAL: 1.0, States.OBSTACLE: -1.0}
+
+# Model cache entries that `GridWorld._edit_cells` keeps up to date. The others are
+# dropped when the world is edited.
+_EDITABLE_CACHE = {
+    "goal_mask",
+    "obstacle_mask",
+    "goals",
+    "obstacles",
+    "terminal",
+    "next_states",
+    "rewards",
+    "csr",
+    "tensor",
+    "fast_tables",
+}
+
+
 class GridWorld:
 
     # Grid Internals
     _rows: int
     _cols: int
     _init_pos: Tuple[int, int]
-    _obstacles: Set[Tuple[int, int]]
-    _goals: Set[Tuple[int, int]]
     _p_slip: float
 
-    _grid: List[List[States]]
+    _grid: np.ndarray  # (rows, cols) uint8 `States`
 
     # Transition Internals
-    _reward: List[List[float]]
+    _reward: np.ndarray  # (rows, cols) float32
+    _reward_fn: Optional[Callable[[np.ndarray, np.ndarray, np.ndarray], np.ndarray]]
     _rng: npr.Generator
 
     # Current state
     _current_pos: Tuple[int, int]
+    _last_action: Actions
+
+    # Whether states are passed as flat indices (see `flat_states`)
+    _flat_states: bool
+
+    # Lazily built arrays over flat state indices, and the goal and obstacle sets
+    _moves: Optional[np.ndarray]
+    _model_cache: Dict[str, Any]
+
+    # Action and observation spaces, created on first use
+    _spaces: Optional[Tuple[Discrete, MultiDiscrete]]
+
+    # Fast-path `step` (see `enable_fast_step`), None when disabled
+    _fast_block: Optional[int]
+    _uniforms: List[float]
+    _uniform_pos: int
 
     def __init__(
         self,
@@ -53,33 +217,122 @@ class GridWorld:
         obstacles: Iterable[Tuple[int, int]],
         p_slip: float,
         seed: Optional[Union[int, npr.Generator]] = None,
+        flat_states: bool = False,
     ):
-        """ Represents the grid-world.  """
-        self._rows = rows
-        self._cols = cols
-        self._grid = [
-            [States.EMPTY for i in range(self.cols)] for j in range(self.rows)
-        ]
-
-        self._init_pos = init_pos
-        self._current_pos = init_pos
-        self._goals = set(goals)
-        self._obstacles = set(obstacles)
-        self._p_slip = p_slip
+        """Represents the grid-world.
 
-        self._grid[init_pos[0]][init_pos[1]] = States.START
+        The grid is stored as a (rows, cols) `uint8` array of `States` and the
+        reward as a (rows, cols) `float32` array. `goals` and `obstacles` can also
+        be given as (N, 2) arrays of positions. With `flat_states`, states are passed
+        as flat indices instead of tuples (see the `flat_states` property).
+        """
+        grid = np.full((rows, cols), States.EMPTY, dtype=np.uint8)
+        grid[tuple(init_pos)] = States.START
+        grid[_as_cells(goals)] = States.GOAL
+        grid[_as_cells(obstacles)] = States.OBSTACLE
+        self._setup(grid, init_pos, p_slip, seed)
+        self._flat_states = flat_states
 
-        for goal_pos in goals:
-            self._grid[goal_pos[0]][goal_pos[1]] = States.GOAL
+    def _setup(
+        self,
+        grid: np.ndarray,
+        init_pos: Tuple[int, int],
+        p_slip: float,
+        seed: Optional[Union[int, npr.Generator]],
+        reward: Optional[np.ndarray] = None,
+    ):
+        self._rows, self._cols = grid.shape
+        self._grid = grid
 
-        for state in obstacles:
-            self._grid[state[0]][state[1]] = States.OBSTACLE
+        row, col = init_pos
+        self._init_pos = (int(row), int(col))
+        self._current_pos = self._init_pos
+        self._last_action = Actions.NO_OP
+        self._flat_states = False
+        self._p_slip = p_slip
 
         self._rng = npr.default_rng(seed=seed)
 
-        self._initialize_rewards()
+        self._moves = None
+        self._model_cache = {}
+        self._fast_block = None
+        self._uniforms = []
+        self._uniform_pos = 0
+        self._reward_fn = None
+        self._spaces = None
+
+        if reward is None:
+            self._initialize_rewards()
+        else:
+            self._reward = reward
         self.reset()
 
+    @classmethod
+    def from_grid(
+        cls,
+        grid: np.ndarray,
+        init_pos: Tuple[int, int],
+        p_slip: float,
+        seed: Optional[Union[int, npr.Generator]] = None,
+        reward: Optional[np.ndarray] = None,
+        flat_states: bool = False,
+    ) -> "GridWorld":
+        """Creates a grid-world around a (rows, cols) array of `States`.
+
+        A `uint8` array is used as the grid without copying it, and is not modified
+        except by later edits of the world. Likewise, a (rows, cols) `float32`
+        `reward` array is used as is instead of computing the rewards from the grid.
+        """
+        grid = np.asarray(grid, dtype=np.uint8)
+        if grid.ndim != 2:
+            raise ValueError("Expected a 2D grid. Got shape {}".format(grid.shape))
+        if reward is not None:
+            reward = np.asarray(reward, dtype=np.float32)
+            if reward.shape != grid.shape:
+                raise ValueError(
+                    "Reward shape {} does not match grid shape {}".format(
+                        reward.shape, grid.shape
+                    )
+                )
+        world = cls.__new__(cls)
+        world._setup(grid, init_pos, p_slip, seed, reward)
+        world._flat_states = flat_states
+        return world
+
+    def __getstate__(self):
+        # The cached arrays can be rebuilt, so they are not pickled.
+        state = self.__dict__.copy()
+        state["_moves"] = None
+        state["_model_cache"] = {}
+        return state
+
+    def __setstate__(self, state):
+        # Worlds pickled before the caches existed do not have them.
+        state.setdefault("_moves", None)
+        state.setdefault("_model_cache", {})
+        state.setdefault("_last_action", Actions.NO_OP)
+        state.setdefault("_flat_states", False)
+        state.setdefault("_fast_block", None)
+        state.setdefault("_reward_fn", None)
+        state.setdefault("_spaces", None)
+        state.setdefault("_uniforms", [])
+        state.setdefault("_uniform_pos", 0)
+
+        # Older worlds stored the grid and rewards as nested lists, next to the goal
+        # and obstacle sets that decided termination. Rebuild the arrays from the sets.
+        old_format = isinstance(state["_grid"], list)
+        if old_format:
+            goals = state.pop("_goals")
+            obstacles = state.pop("_obstacles")
+
+        self.__dict__.update(state)
+        if old_format:
+            self._grid = np.full(self.size, States.EMPTY, dtype=np.uint8)
+            self._grid[self._init_pos] = States.START
+            self._grid[_as_cells(goals)] = States.GOAL
+            self._grid[_as_cells(obstacles)] = States.OBSTACLE
+            self._initialize_rewards()
+
     @property
     def cols(self) -> int:
         return self._cols
@@ -93,33 +346,146 @@ class GridWorld:
         return self._rows, self._cols
 
     @property
-    def grid(self) -> List[List[States]]:
-        return self._grid
+    def grid(self) -> np.ndarray:
+        """Read-only (rows, cols) array of `States`."""
+        return _read_only(self._grid)
+
+    @property
+    def goal_mask(self) -> np.ndarray:
+        """ (rows, cols) boolean array that is True on the goals. """
+        if "goal_mask" not in self._model_cache:
+            self._model_cache["goal_mask"] = self._grid == States.GOAL
+        return _read_only(self._model_cache["goal_mask"])
+
+    @property
+    def obstacle_mask(self) -> np.ndarray:
+        """ (rows, cols) boolean array that is True on the obstacles. """
+        if "obstacle_mask" not in self._model_cache:
+            self._model_cache["obstacle_mask"] = self._grid == States.OBSTACLE
+        return _read_only(self._model_cache["obstacle_mask"])
 
     @property
     def obstacles(self) -> Set[Tuple[int, int]]:
-        return self._obstacles
+        if "obstacles" not in self._model_cache:
+            cells = np.argwhere(self.obstacle_mask)
+            self._model_cache["obstacles"] = set(map(tuple, cells.tolist()))
+        return self._model_cache["obstacles"]
 
     @property
     def goals(self) -> Set[Tuple[int, int]]:
-        return self._goals
+        if "goals" not in self._model_cache:
+            cells = np.argwhere(self.goal_mask)
+            self._model_cache["goals"] = set(map(tuple, cells.tolist()))
+        return self._model_cache["goals"]
 
     @property
-    def goals(self) -> Set[Tuple[int, int]]:
-        return self._goals
+    def reward(self) -> np.ndarray:
+        """Read-only (rows, cols) array with the reward of each cell."""
+        return _read_only(self._reward)
+
+    def set_reward(self, reward: Optional[np.ndarray] = None):
+        """Sets the reward of entering each cell.
+
+        Args:
+            reward: (rows, cols) array, or None for the default rewards (see
+                `_initialize_rewards`). Later edits of the goals and obstacles set
+                the default rewards of the edited cells.
+        """
+        if reward is None:
+            self._initialize_rewards()
+        else:
+            reward = np.array(reward, dtype=np.float32)
+            if reward.shape != self.size:
+                raise ValueError(
+                    "Reward shape {} does not match grid shape {}".format(
+                        reward.shape, self.size
+                    )
+                )
+            self._reward = reward
+        self._invalidate_model()
 
     @property
-    def reward(self) -> List[List[float]]:
-        return self._reward
+    def reward_function(
+        self,
+    ) -> Optional[Callable[[np.ndarray, np.ndarray, np.ndarray], np.ndarray]]:
+        return self._reward_fn
+
+    def set_reward_function(
+        self,
+        reward_fn: Optional[Callable[[np.ndarray, np.ndarray, np.ndarray], np.ndarray]],
+    ):
+        """Adds a reward depending on the transition to the reward of the cells.
+
+        `reward_fn(states, actions, next_states)` is called with broadcastable arrays
+        of flat state indices, chosen actions and next state indices, and returns
+        the rewards of these transitions (see `discrete_world.rewards`). It is
+        evaluated once over all transitions into the `rewards` of the transition
+        model, which `step` and `BatchedGridWorld.step` then look up. Use a
+        picklable callable to keep the world picklable. None removes it.
+        """
+        self._reward_fn = reward_fn
+        self._invalidate_model()
+
+    def _transition_rewards(
+        self, states: np.ndarray, next_states: np.ndarray
+    ) -> np.ndarray:
+        """(len(states), A, K) rewards of the transitions from `states` to the
+        (len(states), A, K) `next_states`."""
+        rewards = self.reward_vector[next_states]
+        if self._reward_fn is not None:
+            actions = np.arange(self.n_actions)[:, None]
+            extra = self._reward_fn(states[:, None, None], actions, next_states)
+            rewards = (rewards + extra).astype(np.float32)
+        return rewards
+
+    def grid_list(self) -> List[List[States]]:
+        """The grid as nested lists of `States`, as it was stored before."""
+        return [[States(x) for x in row] for row in self._grid.tolist()]
+
+    def reward_list(self) -> List[List[float]]:
+        """The reward as nested lists of floats, as it was stored before."""
+        return self._reward.tolist()
 
     @property
     def init_pos(self) -> Tuple[int, int]:
         return self._init_pos
 
     @property
-    def current_state(self) -> Tuple[int, int]:
+    def current_state(self) -> Union[Tuple[int, int], int]:
+        """The (row, col) state of the agent, or its flat index in `flat_states`
+        mode."""
+        if self._flat_states:
+            return self.current_index
         return self._current_pos
 
+    @property
+    def current_index(self) -> int:
+        """Flat index of the state of the agent, in either mode."""
+        row, col = self._current_pos
+        return row * self._cols + col
+
+    @property
+    def flat_states(self) -> bool:
+        """Whether states are flat indices `row * cols + col` instead of tuples.
+
+        In this mode, `step` and `current_state` return flat indices, and
+        `next_state`, `neighbors`, `is_goal`, `is_obstacle` and `done_function`
+        take flat indices, or arrays of them, instead of (row, col) tuples. They are
+        then answered from `move_table` and the goal and obstacle masks, without
+        creating tuples. `state_to_index` and `index_to_state` convert between both
+        forms.
+        """
+        return self._flat_states
+
+    @flat_states.setter
+    def flat_states(self, flat: bool):
+        self._flat_states = bool(flat)
+
+    @property
+    def last_action(self) -> Actions:
+        """ Action actually executed (after slipping) in the last call to `step`. """
+        return self._last_action
+
     @property
     def p_slip(self) -> float:
         return self._p_slip
@@ -128,26 +494,94 @@ class GridWorld:
     def p_slip(self, p: float):
         if 0 <= p <= 1:
             self._p_slip = p
+            self._invalidate_model()
         else:
             raise ValueError(
                 "Slipping probability needs to in [0, 1]. Got {}".format(p)
             )
 
+    def _replace_cells(self, kind: States, cells: Iterable[Tuple[int, int]]):
+        """Replaces all cells of type `kind` with `cells`."""
+        self._grid[self._grid == kind] = States.EMPTY
+        if self._grid[self._init_pos] == States.EMPTY:
+            self._grid[self._init_pos] = States.START
+        self._grid[_as_cells(cells)] = kind
+
     def create_goals(self, goals: Iterable[Tuple[int, int]]):
-        """Setup the obstacles by inputting a list of grid positions"""
-        self._goals = set(goals)
-        for state in self.goals:
-            self.grid[state[0]][state[1]] = States.GOAL
+        """Setup the goals by inputting a list of grid positions"""
+        self._replace_cells(States.GOAL, goals)
+        self._initialize_rewards()
+        self._invalidate_model()
         self.reset()
-    
+
     def create_obstacles(self, obstacles: Iterable[Tuple[int, int]]):
         """Setup the obstacles by inputting a list of grid positions"""
-        self._obstacles = set(obstacles)
-        for state in self.obstacles:
-            self.grid[state[0]][state[1]] = States.OBSTACLE
+        self._replace_cells(States.OBSTACLE, obstacles)
         self._initialize_rewards()
+        self._invalidate_model()
         self.reset()
 
+    def add_goals(self, goals: Iterable[Tuple[int, int]]):
+        """Turns the given cells into goals, replacing any obstacles among them."""
+        self._edit_cells(*_as_cells(goals), States.GOAL)
+
+    def remove_goals(self, goals: Iterable[Tuple[int, int]]):
+        """Empties the given cells that are goals. Other cells are left as they are."""
+        self._remove_cells(States.GOAL, goals)
+
+    def add_obstacles(self, obstacles: Iterable[Tuple[int, int]]):
+        """Turns the given cells into obstacles, replacing any goals among them."""
+        self._edit_cells(*_as_cells(obstacles), States.OBSTACLE)
+
+    def remove_obstacles(self, obstacles: Iterable[Tuple[int, int]]):
+        """Empties the given cells that are obstacles. Other cells are left as they are."""
+        self._remove_cells(States.OBSTACLE, obstacles)
+
+    def _remove_cells(self, kind: States, cells: Iterable[Tuple[int, int]]):
+        rows, cols = _as_cells(cells)
+        keep = self._grid[rows, cols] == kind
+        self._edit_cells(rows[keep], cols[keep], States.EMPTY)
+
+    def _edit_cells(self, rows: np.ndarray, cols: np.ndarray, kind: States):
+        """Sets the given cells to `kind`, and updates the rewards and caches in place.
+
+        Unlike `create_goals` and `create_obstacles`, the cost only depends on the
+        number of edited cells, and the agent is not reset.
+        """
+        if not (self._grid.flags.writeable and self._reward.flags.writeable):
+            raise ValueError("The grid of this world is read-only")
+        if len(rows) == 0:
+            return
+        self._grid[rows, cols] = kind
+        if self._grid[self._init_pos] == States.EMPTY:
+            self._grid[self._init_pos] = States.START
+        self._reward[rows, cols] = _CELL_REWARDS.get(kind, 0.0)
+
+        cache = self._model_cache
+        for key in list(cache):
+            if key not in _EDITABLE_CACHE:
+                del cache[key]
+        if "goal_mask" in cache:
+            cache["goal_mask"][rows, cols] = kind == States.GOAL
+        if "obstacle_mask" in cache:
+            cache["obstacle_mask"][rows, cols] = kind == States.OBSTACLE
+        cells = list(zip(rows.tolist(), cols.tolist()))
+        for key, key_kind in (("goals", States.GOAL), ("obstacles", States.OBSTACLE)):
+            if key in cache:
+                if kind == key_kind:
+                    cache[key].update(cells)
+                else:
+                    cache[key].difference_update(cells)
+
+        idx = rows * self.cols + cols
+        if "terminal" in cache:
+            cache["terminal"][idx] = kind in (States.GOAL, States.OBSTACLE)
+        if "rewards" in cache:
+            # Only the edited states and their neighbors can move into edited states
+            sources = np.unique(self.move_table[idx].reshape(-1))
+            next_states = cache["next_states"][sources]
+            cache["rewards"][sources] = self._transition_rewards(sources, next_states)
+
     def _initialize_rewards(self):
         """Initialize the reward function.
 
@@ -157,37 +591,235 @@ class GridWorld:
             Others: 0
         """
 
-        def rew_fn(i, j) -> float:
-            """Return the reward for a position i,j"""
-            if self.grid[i][j] == States.GOAL:
-                return 1.0
-            elif self.grid[i][j] == States.OBSTACLE:
-                return -1.0
-            else:
-                return 0.0
-
-        # TODO(anand): Is the required? Can we not compute the rewards on the fly?
-        self._reward = [
-            [rew_fn(i, j) for j in range(self.cols)] for i in range(self.rows)
-        ]
-
-        # Sanity check for now
-        for goal_pos in self.goals:
-            assert (
-                self._reward[goal_pos[0]][goal_pos[1]] == 1.0
-            ), "Goal at {} does not have a reward of 1.0".format(goal_pos)
-
-        for obstacle_pos in self.obstacles:
-            assert (
-                self._reward[obstacle_pos[0]][obstacle_pos[1]] == -1.0
-            ), "Obstacle at {} does not have a reward of -1.0".format(obstacle_pos)
-
-    def next_state(self, state: Tuple[int, int], action: Actions) -> Tuple[int, int]:
+        self._reward = np.zeros(self.size, dtype=np.float32)
+        for kind, reward in _CELL_REWARDS.items():
+            self._reward[self._grid == kind] = reward
+
+    @property
+    def n_states(self) -> int:
+        return self._rows * self._cols
+
+    @property
+    def n_actions(self) -> int:
+        return len(Actions)
+
+    @overload
+    def state_to_index(self, state: Tuple[int, int]) -> int:
+        ...
+
+    @overload
+    def state_to_index(self, state: np.ndarray) -> np.ndarray:
+        ...
+
+    def state_to_index(self, state):
+        """Returns the flat index `row * cols + col` of a state.
+
+        `state` can also be an (..., 2) array of states.
+        """
+        states = np.asarray(state)
+        idx = states[..., 0] * self.cols + states[..., 1]
+        return int(idx) if idx.ndim == 0 else idx
+
+    @overload
+    def index_to_state(self, idx: int) -> Tuple[int, int]:
+        ...
+
+    @overload
+    def index_to_state(self, idx: np.ndarray) -> np.ndarray:
+        ...
+
+    def index_to_state(self, idx):
+        """Returns the state (row, col) of a flat index.
+
+        `idx` can also be an array of indices, giving an (..., 2) array of states.
+        """
+        if np.ndim(idx) == 0:
+            return divmod(int(idx), self.cols)
+        return np.stack(np.divmod(idx, self.cols), axis=-1)
+
+    def _invalidate_model(self):
+        """Drops the cached transition model after the world was changed."""
+        self._model_cache = {}
+
+    def _preload_model(self, move_table: np.ndarray, **arrays: np.ndarray):
+        """Fills the caches with arrays that were built elsewhere.
+
+        `arrays` are entries of the model cache, e.g. `next_states`, `rewards` and
+        `terminal` (see `transition_model`).
+        """
+        self._moves = move_table
+        self._model_cache.update(arrays)
+
+    @property
+    def move_table(self) -> np.ndarray:
+        """(S, A) array with the flat index of `next_state` for every state and action."""
+        if self._moves is None:
+            cells = np.arange(self.n_states)
+            r, c = np.divmod(cells, self.cols)
+            next_r = np.clip(r[:, None] + ACTION_OFFSETS[:, 0], 0, self.rows - 1)
+            next_c = np.clip(c[:, None] + ACTION_OFFSETS[:, 1], 0, self.cols - 1)
+            moves = next_r * self.cols + next_c
+            self._moves = moves.astype(index_dtype(self.n_states))
+        return self._moves
+
+    @property
+    def reward_vector(self) -> np.ndarray:
+        """(S,) array with the reward observed when entering each state."""
+        return self.reward.reshape(-1)
+
+    @property
+    def terminal_mask(self) -> np.ndarray:
+        """(S,) boolean array that is True for the states where `done_function` is."""
+        if "terminal" not in self._model_cache:
+            terminal = (self.goal_mask | self.obstacle_mask).reshape(-1)
+            self._model_cache["terminal"] = terminal
+        return _read_only(self._model_cache["terminal"])
+
+    @property
+    def transition_model(self) -> TransitionModel:
+        """Compact (S, A, K) transition model of the world. See `TransitionModel`.
+
+        The next states are stored as 32-bit indices and the rewards as 32-bit
+        floats, and the probabilities are a broadcast view of the K slip
+        probabilities, so the model grows linearly with the number of cells.
+        """
+        if "next_states" not in self._model_cache:
+            n_actions = self.n_actions
+            actions = np.arange(n_actions)
+            outcomes = np.stack(
+                [actions, (actions - 1) % n_actions, (actions + 1) % n_actions], axis=-1
+            )  # (A, K) action executed for each outcome
+            self._model_cache["next_states"] = self.move_table[:, outcomes]
+        next_states = self._model_cache["next_states"]
+
+        if "rewards" not in self._model_cache:
+            states = np.arange(self.n_states)
+            rewards = self._transition_rewards(states, next_states)
+            self._model_cache["rewards"] = rewards
+
+        p = self.p_slip
+        probs = np.broadcast_to(np.array([1 - p, p / 2, p / 2]), next_states.shape)
+        return TransitionModel(
+            next_states=next_states,
+            probs=probs,
+            rewards=self._model_cache["rewards"],
+            terminal=self.terminal_mask,
+        )
+
+    @property
+    def sparse_transitions(self) -> List:
+        """One sparse (S, S) matrix of P(s' | s, a) per action. Requires scipy."""
+        if "csr" not in self._model_cache:
+            self._model_cache["csr"] = self.transition_model.to_csr()
+        return self._model_cache["csr"]
+
+    @property
+    def transition_tensor(self) -> np.ndarray:
+        """Dense (S, A, S) array with the probabilities P(s' | s, a)."""
+        if "tensor" not in self._model_cache:
+            model = self.transition_model
+            tensor = np.zeros((self.n_states, self.n_actions, self.n_states))
+            s, a, _ = np.indices(model.next_states.shape)
+            np.add.at(tensor, (s, a, model.next_states), model.probs)
+            self._model_cache["tensor"] = tensor
+        return self._model_cache["tensor"]
+
+    def distances_from(
+        self,
+        sources: Iterable[Tuple[int, int]],
+        passable: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Number of moves from the nearest of `sources` to every cell.
+
+        Runs a breadth-first search over the non-obstacle cells, or the cells where
+        the (rows, cols) `passable` mask is True, expanding the whole frontier with
+        `move_table` at once. Moves are symmetric, so this is also the number of
+        moves from every cell to the nearest source.
+
+        Returns:
+            (rows, cols) integer array, -1 on obstacles and unreachable cells.
+        """
+        if passable is None:
+            free = ~self.obstacle_mask.reshape(-1)
+        else:
+            free = np.asarray(passable, dtype=bool).reshape(-1)
+        moves = self.move_table[:, : Actions.NO_OP]
+        distances = np.full(self.n_states, -1, dtype=moves.dtype)
+
+        rows, cols = _as_cells(sources)
+        frontier = rows * self.cols + cols
+        frontier = np.unique(frontier[free[frontier]])
+        distance = 0
+        while frontier.size:
+            distances[frontier] = distance
+            distance += 1
+            candidates = np.unique(moves[frontier])
+            frontier = candidates[free[candidates] & (distances[candidates] < 0)]
+        return distances.reshape(self.size)
+
+    @property
+    def goal_distances(self) -> np.ndarray:
+        """Read-only (rows, cols) array of `distances_from(goals)`."""
+        if "goal_distances" not in self._model_cache:
+            goals = np.argwhere(self.goal_mask)
+            self._model_cache["goal_distances"] = self.distances_from(goals)
+        return _read_only(self._model_cache["goal_distances"])
+
+    def goal_reachable(self, state: Optional[Tuple[int, int]] = None) -> bool:
+        """Whether a goal can be reached from `state`, by default `init_pos`."""
+        row, col = self.init_pos if state is None else state
+        return bool(self.goal_distances[row, col] >= 0)
+
+    @property
+    def connected_components(self) -> np.ndarray:
+        """Read-only (rows, cols) array labelling the connected non-obstacle cells.
+
+        The components are numbered from 0 in the order of their first cell, and
+        obstacles are labelled -1. The labels are found by repeatedly hooking the
+        larger of the two labels of every edge onto the smaller one, and following
+        the labels to their roots, all with array operations.
+        """
+        if "components" not in self._model_cache:
+            free = ~self.obstacle_mask.reshape(-1)
+            states = np.flatnonzero(free)
+            # Edges to the right and down neighbors between non-obstacle cells
+            moves = self.move_table[states][:, [Actions.RIGHT, Actions.DOWN]]
+            u = np.repeat(states, 2)
+            v = moves.reshape(-1)
+            keep = free[v] & (u != v)
+            u, v = u[keep], v[keep]
+
+            parent = np.arange(self.n_states, dtype=moves.dtype)
+            while True:
+                pu, pv = parent[u], parent[v]
+                if np.array_equal(pu, pv):
+                    break
+                np.minimum.at(parent, np.maximum(pu, pv), np.minimum(pu, pv))
+                while True:
+                    grandparent = parent[parent]
+                    if np.array_equal(grandparent, parent):
+                        break
+                    parent = grandparent
+
+            labels = np.full(self.n_states, -1, dtype=moves.dtype)
+            labels[states] = np.unique(parent[states], return_inverse=True)[1]
+            self._model_cache["components"] = labels.reshape(self.size)
+        return _read_only(self._model_cache["components"])
+
+    def next_state(
+        self, state: Union[Tuple[int, int], int, np.ndarray], action: Actions
+    ) -> Union[Tuple[int, int], int, np.ndarray]:
         """
         Returns next state as tuple (x, y).
         At the edges or corners, returns the same state if actions force it to go outside.
+
+        In `flat_states` mode, `state` is a flat index and so is the result. Both
+        `state` and `action` can then also be arrays.
         """
-        x, y = state
+        if self._flat_states:
+            next_s = self.move_table[state, action]
+            return next_s.item() if np.ndim(next_s) == 0 else next_s
+        x, y = cast(Tuple[int, int], state)
         if action == Actions.UP:
             if x == 0:
                 return (x, y)
@@ -208,11 +840,20 @@ class GridWorld:
             return (x, y)
         return neighbor
 
-    def neighbors(self, state: Tuple[int, int]) -> Set[Tuple[int, int]]:
-        """ Gets list of all neighbors of a state. """
-        l = set()
+    def neighbors(
+        self, state: Union[Tuple[int, int], int, np.ndarray]
+    ) -> Union[Set[Tuple[int, int]], Set[int], np.ndarray]:
+        """Gets list of all neighbors of a state.
+
+        In `flat_states` mode, these are the flat indices of the neighbors of a flat
+        index, or for an array of states the (..., A) next state of every action.
+        """
+        if self._flat_states:
+            moves = self.move_table[state]
+            return set(moves.tolist()) if np.ndim(state) == 0 else moves
+        l = set()  # type: Set[Tuple[int, int]]
         for a in Actions:
-            l.add(self.next_state(state, a))
+            l.add(cast(Tuple[int, int], self.next_state(state, a)))
         return l
 
     def choose_action(self, action: Actions) -> Actions:
@@ -238,38 +879,59 @@ class GridWorld:
         else:
             return self._rng.choice(other_actions)
 
-    def is_obstacle(self, state: Tuple[int, int]) -> bool:
-        """ Checks if the state is an obstacle. """
-        if state in self.obstacles:
-            return True
-        return False
+    def is_obstacle(
+        self, state: Union[Tuple[int, int], int, np.ndarray]
+    ) -> Union[bool, np.ndarray]:
+        """Checks if the state is an obstacle.
 
-    def is_goal(self, state: Tuple[int, int]) -> bool:
-        """ Checks if the state is a goal. """
-        if state in self.goals:
-            return True
-        return False
+        `state` is a (row, col) position, or in `flat_states` mode a flat index or an
+        array of flat indices.
+        """
+        return self._state_is(state, States.OBSTACLE, "obstacle_mask")
+
+    def is_goal(
+        self, state: Union[Tuple[int, int], int, np.ndarray]
+    ) -> Union[bool, np.ndarray]:
+        """Checks if the state is a goal.
+
+        `state` is a (row, col) position, or in `flat_states` mode a flat index or an
+        array of flat indices.
+        """
+        return self._state_is(state, States.GOAL, "goal_mask")
+
+    def _state_is(
+        self, state: Union[Tuple[int, int], int, np.ndarray], kind: States, name: str
+    ) -> Union[bool, np.ndarray]:
+        # Outside of `flat_states` mode, lists and arrays are (row, col) positions
+        # too, so that they give a single bool instead of a mask per coordinate
+        if isinstance(state, tuple) or (not self._flat_states and np.ndim(state) == 1):
+            row, col = cast(Tuple[int, int], tuple(np.asarray(state).tolist()))
+            return self._cell_is((row, col), kind)
+        return self._check_mask(name, state)
+
+    def _cell_is(self, state: Tuple[int, int], kind: States) -> bool:
+        # Positions outside of the grid are neither goals nor obstacles, instead of
+        # raising or wrapping around with negative indices
+        row, col = state
+        n_rows, n_cols = self._grid.shape
+        if not (0 <= row < n_rows and 0 <= col < n_cols):
+            return False
+        return bool(self._grid[row, col] == kind)
+
+    def _check_mask(self, name: str, state: Union[int, np.ndarray]):
+        mask = getattr(self, name).reshape(-1)
+        if np.ndim(state) == 0:
+            return mask.item(state)
+        return mask[state]
 
     def __str__(self):
-        def print_fn(i, j) -> str:
-            """Return the single char string representation of each state"""
-            if self.grid[i][j] == States.GOAL:
-                return "G"
-            elif self.grid[i][j] == States.OBSTACLE:
-                return "O"
-            elif self.current_state == (i, j):
-                return "C"
-            else:
-                return " "
-
-        grid_lines = [
-            "".join([print_fn(i, j) for j in range(self.cols)])
-            for i in range(self.rows)
-        ]
-
-        return "\n".join(grid_lines)
-
-    def done_function(self, state: Tuple[int, int]) -> bool:
+        # Single char string representation of each state, indexed by `States`
+        chars = np.array([" ", " ", "G", "O"])[self._grid]
+        if self._grid[self._current_pos] not in (States.GOAL, States.OBSTACLE):
+            chars[self._current_pos] = "C"
+        return "\n".join("".join(row) for row in chars.tolist())
+
+    def done_function(self, state: Union[Tuple[int, int], int]) -> bool:
         '''
             Determines when an episode terminates. Customizable function depending on tasks.
             Design suggestions:
@@ -289,35 +951,205 @@ class GridWorld:
             return True
         return False
 
-    def step(self, action: Actions) -> Tuple[Tuple[int, int], float, bool]:
-        """ Returns next state, observed reward and done. """
+    def step(
+        self, action: Union[Actions, int]
+    ) -> Tuple[Union[Tuple[int, int], int], float, bool]:
+        """Returns next state, observed reward and done.
+
+        The next state is a flat index in `flat_states` mode.
+        """
+        if self._fast_block is not None:
+            return self._fast_step(action)
         action = Actions(action)
         p_action = self.choose_action(action)  # get the stochastic action
         next_state = self.next_state(self.current_state, p_action)  # next state
-        reward = self.reward[next_state[0]][next_state[1]]  # reward observed
-        self._current_pos = next_state  # update current state
+        if isinstance(next_state, tuple):
+            next_pos = next_state
+        else:
+            next_state = int(next_state)
+            next_pos = divmod(next_state, self._cols)
+        if self._reward_fn is None:
+            reward = float(self._reward[next_pos])  # reward observed
+        else:
+            s = self.current_index
+            outcome = _OUTCOMES[action][p_action]
+            reward = self.transition_model.rewards.item(s, action, outcome)
+        self._current_pos = next_pos  # update current state
+        self._last_action = Actions(p_action)
         done = self.done_function(next_state)  # check if done
         return (next_state, reward, done)
 
+    def enable_fast_step(self, block_size: int = 4096):
+        """Makes `step` look its results up in precomputed arrays.
+
+        The fast path uses `move_table`, the rewards and `terminal_mask` instead of
+        `choose_action`, `next_state` and `done_function`, so it ignores
+        overrides of these methods. It samples the same distribution as `step`.
+
+        Args:
+            block_size: Number of uniform numbers drawn from the RNG at once. Every
+                step consumes one number `u`, and slips when `u < p_slip`, to the
+                previous action when `u < p_slip / 2` and to the next one
+                otherwise. A seeded world then follows the same trajectories for
+                any block size, but not the ones of the default `step`. With a
+                block size of 0, the RNG is instead called on every step exactly as
+                `choose_action` does, which reproduces the trajectories of the
+                default `step` for the same seed.
+        """
+        if block_size < 0:
+            raise ValueError("Block size must be >= 0. Got {}".format(block_size))
+        self._fast_block = int(block_size)
+        self._uniforms = []
+        self._uniform_pos = 0
+
+    def disable_fast_step(self):
+        self._fast_block = None
+
+    @property
+    def fast_step_enabled(self) -> bool:
+        return self._fast_block is not None
+
+    def _fast_step(
+        self, action: int
+    ) -> Tuple[Union[Tuple[int, int], int], float, bool]:
+        if not 0 <= action < N_ACTIONS:
+            raise ValueError("{} is not a valid Actions".format(action))
+        action = chosen = int(action)
+        outcome = 0
+
+        if self._fast_block:
+            pos = self._uniform_pos
+            if pos == len(self._uniforms):
+                self._uniforms = self._rng.random(self._fast_block).tolist()
+                pos = 0
+            u = self._uniforms[pos]
+            self._uniform_pos = pos + 1
+            if u < self._p_slip:
+                outcome = 1 if u < 0.5 * self._p_slip else 2
+        elif self._rng.random() < self._p_slip:
+            # Same draw as `self._rng.choice` over the two other actions
+            outcome = 1 + int(self._rng.integers(2))
+        if outcome:
+            action = (action + 2 * outcome - 3) % N_ACTIONS
+
+        tables = self._model_cache.get("fast_tables")
+        if tables is None:
+            rewards = self.reward_vector
+            if self._reward_fn is not None:
+                rewards = self.transition_model.rewards
+            tables = (self.move_table, rewards, self.terminal_mask)
+            self._model_cache["fast_tables"] = tables
+        moves, rewards, terminal = tables
+
+        row, col = self._current_pos
+        s = row * self._cols + col
+        next_s = moves.item(s, action)
+        if rewards.ndim == 1:
+            reward = rewards.item(next_s)
+        else:
+            reward = rewards.item(s, chosen, outcome)
+        self._current_pos = divmod(next_s, self._cols)
+        self._last_action = _ACTIONS[action]
+        if self._flat_states:
+            return (next_s, reward, terminal.item(next_s))
+        return (self._current_pos, reward, terminal.item(next_s))
+
     def reset(self):
         self._current_pos = self.init_pos
 
-    def render(self, mode="human"):
+    def render(
+        self,
+        mode: str = "human",
+        cell_size: int = 8,
+        trajectory: Optional[np.ndarray] = None,
+    ) -> Union[str, np.ndarray]:
+        """Text of the grid, or with `mode="rgb_array"` an RGB image of it.
+
+        Args:
+            mode: "human" for the text of `__str__`, or "rgb_array" for a
+                (rows * cell_size, cols * cell_size, 3) `uint8` image drawn by
+                `discrete_world.raster.render_grid`.
+            cell_size: Side of a cell in pixels.
+            trajectory: (T, 2) states, or (T,) flat state indices, to highlight in the
+                image.
+        """
+        if mode == "rgb_array":
+            # Imported here, as the raster module imports this one
+            from discrete_world.raster import render_grid
+
+            agents = np.array([self._current_pos])
+            return render_grid(self._grid, agents, cell_size, trajectory)
         return self.__str__()
 
     def seed(self, seed: Optional[Union[int, npr.Generator]] = None):
         self._rng = npr.default_rng(seed=seed)
+        self._uniforms = []
+        self._uniform_pos = 0
 
     @property
     def action_space(self) -> Discrete:
-        return Discrete(4)  # Actions are UP, DOWN, LEFT, RIGHT
+        """One action per member of `Actions`, including `NO_OP`."""
+        return self._get_spaces()[0]
 
     @property
-    def observation_space(self) -> Discrete:
-        return Discrete(2)  # Observations are the (row, col) position of agent
+    def observation_space(self) -> MultiDiscrete:
+        """Observations are the (row, col) position of the agent."""
+        return self._get_spaces()[1]
+
+    def _get_spaces(self) -> Tuple[Discrete, MultiDiscrete]:
+        # The spaces are only created once, as they hold their own RNG for sampling
+        if self._spaces is None:
+            self._spaces = (Discrete(N_ACTIONS), MultiDiscrete([self.rows, self.cols]))
+        return self._spaces
 
     def save_object(self, filepath):
         with open(filepath, "wb") as data_file:
             pickle.dump(self, data_file)
 
-    # TODO(aniruddh): Make a load from json method.
+    def save(self, filepath: Union[str, Path]):
+        """Saves the world in the binary world format (see `read_world_header`).
+
+        Only the layout of the world is saved, not its current state or RNG.
+        """
+        header = json.dumps(
+            {
+                "rows": self.rows,
+                "cols": self.cols,
+                "init_pos": list(self.init_pos),
+                "p_slip": self.p_slip,
+            }
+        ).encode("utf-8")
+        end = len(WORLD_MAGIC) + _WORLD_PREFIX.size + len(header)
+        padding = -end % _WORLD_ALIGNMENT
+        with open(filepath, "wb") as data_file:
+            data_file.write(WORLD_MAGIC)
+            data_file.write(_WORLD_PREFIX.pack(WORLD_VERSION, len(header)))
+            data_file.write(header)
+            data_file.write(b"\0" * padding)
+            np.ascontiguousarray(self._grid).tofile(data_file)
+
+    @classmethod
+    def load(
+        cls,
+        filepath: Union[str, Path],
+        mmap: bool = True,
+        seed: Optional[Union[int, npr.Generator]] = None,
+    ) -> "GridWorld":
+        """Loads a world saved with `save`.
+
+        If `mmap` is set, the grid is memory-mapped copy-on-write instead of read,
+        so loading does not depend on the size of the grid and edits of the world do
+        not change the file.
+        """
+        header = read_world_header(filepath)
+        shape = (header["rows"], header["cols"])
+        if mmap:
+            grid = np.memmap(  # type: np.ndarray
+                filepath, dtype=np.uint8, mode="c", offset=header["offset"], shape=shape
+            )
+        else:
+            with open(filepath, "rb") as data_file:
+                data_file.seek(header["offset"])
+                grid = np.fromfile(data_file, dtype=np.uint8, count=shape[0] * shape[1])
+            grid = grid.reshape(shape)
+        return cls.from_grid(grid, header["init_pos"], header["p_slip"], seed)
@@ -0,0 +1,313 @@
+"""Tabular temporal-difference learning on batches of grid-worlds.
+
+The learners step a `BatchedGridWorld` of many environments at once and update their
+(S, A) table of action values from the whole batch of transitions with scatter-add
+operations, so one update costs a few array operations whatever the number of
+environments. Several environments often update the same (state, action) pair in one
+batch, e.g. right after a reset; their TD errors are averaged, so that the step size
+does not grow with the batch.
+
+    learner = TabularLearner(world, "sarsa", n_envs=256, seed=0)
+    history = learner.train(100_000, log_every=10_000, callback=print)
+    policy = learner.policy
+
+`train` returns the list of all its reports once it is done, and `callback` gets
+every report as soon as it is made.
+
+Usage: python -m discrete_world.learning [--algorithm sarsa] [--envs 256] ...
+"""
+import time
+import argparse
+from typing import List, Tuple, Union, Callable, Optional, NamedTuple
+
+import numpy as np
+import numpy.random as npr
+
+from discrete_world.grid import GridWorld
+from discrete_world.vector import BatchedGridWorld
+
+ALGORITHMS = ("q_learning", "sarsa", "expected_sarsa")
+
+
+class TrainStats(NamedTuple):
+    """Metrics of the steps since the previous report of `TabularLearner.train`."""
+
+    steps: int  # transitions so far, over all environments
+    episodes: int  # episodes finished so far
+    steps_per_sec: float
+    mean_return: float  # undiscounted return of the episodes finished since then
+    mean_abs_td: float  # mean absolute TD error of the updates since then
+    max_q_change: float  # largest change of an action value since then
+    agreement: float  # fraction of states where the greedy action is the reference's
+
+
+class TabularLearner:
+    """Q-learning, SARSA or Expected SARSA with an epsilon-greedy behavior policy.
+
+    The targets of the algorithms for a transition (s, a, r, s') are
+        q_learning: r + gamma * max_a' Q(s', a')
+        sarsa: r + gamma * Q(s', a'), with a' the next action taken in s'
+        expected_sarsa: r + gamma * E[Q(s', a')] under the epsilon-greedy policy
+    and the bootstrap term is 0 when s' is terminal. Actions are the chosen actions,
+    before slipping, so the slips are part of the environment.
+    """
+
+    _world: GridWorld
+    _algorithm: str
+    _batch: BatchedGridWorld
+    _rng: npr.Generator
+    _q: np.ndarray  # (S, A)
+
+    # Current state
+    _actions: np.ndarray  # (n_envs,) actions to take in the current states
+    _returns: np.ndarray  # (n_envs,) return of the running episodes
+    _steps: int
+    _episodes: int
+
+    def __init__(
+        self,
+        world: GridWorld,
+        algorithm: str = "q_learning",
+        n_envs: int = 64,
+        gamma: float = 0.95,
+        alpha: float = 0.1,
+        epsilon: float = 0.1,
+        seed: Optional[Union[int, npr.Generator]] = None,
+    ):
+        """
+        Args:
+            world: The grid-world to learn.
+            algorithm: One of `ALGORITHMS`.
+            n_envs: Number of environments stepped in parallel.
+            gamma: Discount factor.
+            alpha: Step size.
+            epsilon: Probability of a uniformly random action.
+            seed: Seed of the exploration and of the slips.
+        """
+        if algorithm not in ALGORITHMS:
+            raise ValueError(
+                "Algorithm must be one of {}. Got {}".format(
+                    ", ".join(ALGORITHMS), algorithm
+                )
+            )
+        self._world = world
+        self._algorithm = algorithm
+        self.gamma = gamma
+        self.alpha = alpha
+        self.epsilon = epsilon
+        self._rng = npr.default_rng(seed=seed)
+        self._batch = BatchedGridWorld(
+            world, n_envs, seed=int(self._rng.integers(1 << 63)), auto_reset=True
+        )
+        self._q = np.zeros((world.n_states, world.n_actions))
+        self.reset()
+
+    @property
+    def world(self) -> GridWorld:
+        return self._world
+
+    @property
+    def algorithm(self) -> str:
+        return self._algorithm
+
+    @property
+    def n_envs(self) -> int:
+        return self._batch.num_envs
+
+    @property
+    def q(self) -> np.ndarray:
+        """(S, A) action values over flat state indices."""
+        return self._q
+
+    @property
+    def policy(self) -> np.ndarray:
+        """(S,) greedy policy of the action values."""
+        return np.argmax(self._q, axis=-1)
+
+    def q_value(self, state: Tuple[int, int], action: int) -> float:
+        return float(self._q[self._world.state_to_index(state), action])
+
+    def reset(self):
+        """Restarts the episodes of all environments, keeping the action values."""
+        self._batch.reset()
+        self._actions = self.act(self._current_indices())
+        self._returns = np.zeros(self.n_envs)
+        self._steps = 0
+        self._episodes = 0
+
+    def _current_indices(self) -> np.ndarray:
+        return self._world.state_to_index(self._batch.current_states)
+
+    def act(self, states: np.ndarray) -> np.ndarray:
+        """Epsilon-greedy actions in the given flat states, breaking ties randomly."""
+        q = self._q[states]
+        best = q == q.max(axis=-1, keepdims=True)
+        greedy = np.argmax(best * self._rng.random(q.shape), axis=-1)
+        explore = self._rng.random(len(states)) < self.epsilon
+        random_actions = self._rng.integers(0, q.shape[1], len(states))
+        return np.where(explore, random_actions, greedy)
+
+    def _bootstrap(self, next_states: np.ndarray, next_actions: Optional[np.ndarray]):
+        q_next = self._q[next_states]
+        if self._algorithm == "q_learning":
+            return q_next.max(axis=-1)
+        if self._algorithm == "sarsa":
+            return q_next[np.arange(len(next_states)), next_actions]
+        # Ties of the greedy action share its probability, but not its value
+        return (1 - self.epsilon) * q_next.max(axis=-1) + self.epsilon * q_next.mean(
+            axis=-1
+        )
+
+    def update(
+        self,
+        states: np.ndarray,
+        actions: np.ndarray,
+        rewards: np.ndarray,
+        next_states: np.ndarray,
+        dones: np.ndarray,
+        next_actions: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Updates the action values from a batch of transitions.
+
+        Args:
+            states, actions, rewards, next_states, dones: (B,) arrays of the
+                transitions, with flat state indices.
+            next_actions: (B,) actions taken in `next_states`, needed for SARSA.
+
+        Returns:
+            The (B,) TD errors before the update.
+        """
+        if self._algorithm == "sarsa" and next_actions is None:
+            raise ValueError("SARSA needs the next actions")
+        bootstrap = np.where(dones, 0.0, self._bootstrap(next_states, next_actions))
+        flat_q = self._q.reshape(-1)
+        pairs = states * self._q.shape[1] + actions
+        td = rewards + self.gamma * bootstrap - flat_q[pairs]
+
+        # Mean TD error of every distinct (state, action) pair of the batch
+        pairs, inverse = np.unique(pairs, return_inverse=True)
+        sums = np.bincount(inverse, weights=td, minlength=len(pairs))
+        counts = np.bincount(inverse, minlength=len(pairs))
+        flat_q[pairs] += self.alpha * sums / counts
+        return td
+
+    def step(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Steps all environments once and updates from their transitions.
+
+        Returns:
+            The (n_envs,) TD errors, and the returns of the episodes that finished.
+        """
+        world = self._world
+        states = self._current_indices()
+        actions = self._actions
+        next_states, rewards, dones = self._batch.step(actions)
+        next_states = world.state_to_index(next_states)
+
+        # Actions in the states the next step starts from, where finished episodes
+        # were already reset; their bootstrap term is 0 anyway
+        current = np.where(dones, world.state_to_index(world.init_pos), next_states)
+        self._actions = self.act(current)
+        td = self.update(states, actions, rewards, next_states, dones, self._actions)
+
+        self._returns += rewards
+        finished = self._returns[dones]
+        self._returns[dones] = 0.0
+        self._steps += self.n_envs
+        self._episodes += len(finished)
+        return td, finished
+
+    def train(
+        self,
+        n_steps: int,
+        log_every: Optional[int] = None,
+        reference_policy: Optional[np.ndarray] = None,
+        callback: Optional[Callable[[TrainStats], None]] = None,
+    ) -> List[TrainStats]:
+        """Trains for `n_steps` transitions, over all environments.
+
+        Args:
+            n_steps: Number of transitions, rounded up to whole batches.
+            log_every: Transitions between reports. Defaults to one report at the
+                end.
+            reference_policy: (S,) policy, e.g. of `solvers.value_iteration`, whose
+                agreement with the greedy policy is reported over the non-terminal
+                states.
+            callback: Called with every report as it is made.
+
+        Returns:
+            The reports.
+        """
+        log_every = max(log_every or n_steps, 1)
+        non_terminal = ~self._world.terminal_mask
+        history = []  # type: List[TrainStats]
+        done = 0
+        while done < n_steps:
+            n_batches = -(-min(log_every, n_steps - done) // self.n_envs)
+            q_before = self._q.copy()
+            td_sum = 0.0
+            batch_returns = []
+            start = time.perf_counter()
+            for _ in range(n_batches):
+                td, finished = self.step()
+                td_sum += np.abs(td).sum()
+                batch_returns.append(finished)
+            elapsed = time.perf_counter() - start
+            done += n_batches * self.n_envs
+
+            returns = np.concatenate(batch_returns)
+            agreement = float("nan")
+            if reference_policy is not None:
+                same = self.policy == np.asarray(reference_policy)
+                agreement = float(same[non_terminal].mean())
+            stats = TrainStats(
+                steps=self._steps,
+                episodes=self._episodes,
+                steps_per_sec=n_batches * self.n_envs / max(elapsed, 1e-9),
+                mean_return=float(returns.mean()) if len(returns) else float("nan"),
+                mean_abs_td=float(td_sum / (n_batches * self.n_envs)),
+                max_q_change=float(np.abs(self._q - q_before).max()),
+                agreement=agreement,
+            )
+            history.append(stats)
+            if callback is not None:
+                callback(stats)
+        return history
+
+
+if __name__ == "__main__":
+    from discrete_world import solvers
+    from discrete_world.generate import generate_world
+
+    parser = argparse.ArgumentParser(description="Tabular TD learning on a grid-world")
+    parser.add_argument("--algorithm", choices=ALGORITHMS, default="q_learning")
+    parser.add_argument("--size", type=int, default=16, help="Rows and columns")
+    parser.add_argument("--kind", default="random", help="Obstacle generator")
+    parser.add_argument("--envs", type=int, default=256, help="Parallel environments")
+    parser.add_argument("--steps", type=int, default=1000000, help="Transitions")
+    parser.add_argument("--log-every", type=int, default=100000)
+    parser.add_argument("--alpha", type=float, default=0.1)
+    parser.add_argument("--epsilon", type=float, default=0.1)
+    parser.add_argument("--gamma", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    world = generate_world(rows=args.size, cols=args.size, kind=args.kind, seed=0)
+    reference, _ = solvers.value_iteration(world, gamma=args.gamma)
+    learner = TabularLearner(
+        world,
+        args.algorithm,
+        args.envs,
+        args.gamma,
+        args.alpha,
+        args.epsilon,
+        args.seed,
+    )
+    learner.train(
+        args.steps,
+        args.log_every,
+        reference,
+        lambda s: print(
+            "{:>10} steps {:>8} episodes {:>10.0f} steps/s return {:6.3f} "
+            "|td| {:.4f} max dQ {:.4f} agreement {:.3f}".format(*s)
+        ),
+    )
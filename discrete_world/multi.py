@@ -0,0 +1,281 @@
+from typing import Optional, Tuple, Union, Iterable
+
+import numpy as np
+import numpy.random as npr
+
+from discrete_world.grid import Actions, GridWorld, States, _as_cells, _CELL_REWARDS
+from discrete_world.raster import render_batch
+from discrete_world.vector import BatchedGridWorld
+
+TERMINATIONS = ("any", "all")
+
+
+class MultiAgentGridWorld:
+    """Steps `n_agents` agents jointly through one grid-world.
+
+    The agents slip like in `GridWorld.choose_action`, but unlike the independent
+    agents of `BatchedGridWorld` they block each other: two agents never share a
+    cell and never swap cells. When several agents move into the same cell, an agent
+    already staying there keeps it, and otherwise the agent with the lowest index
+    gets it. Agents moving head-on into each other's cells both stay. The blocked
+    agents stay in place, which can block other agents in turn, so the conflicts are
+    resolved again until none are left. All of this is done with array operations
+    over the agents.
+
+    The episode ends according to `termination` (see `GridWorld.done_function`):
+        "any": when any agent reaches a goal (scenario C).
+        "all": when every agent has reached its goal (scenario D). Agents that
+            reach their goal finish: they stop moving and leave the grid, so they
+            no longer block the others.
+    In both cases, it also ends when any agent moves into an obstacle.
+
+    The slips of the agents are sampled by a `BatchedGridWorld` with one environment
+    per agent, which is not stepped itself.
+    """
+
+    _world: GridWorld
+    _n_agents: int
+    _slips: BatchedGridWorld  # samples the executed actions of the agents
+    _termination: str
+    _init_positions: np.ndarray  # (N,) flat indices
+    _agent_goals: Optional[np.ndarray]  # (N,) flat indices
+
+    # Current state
+    _pos: np.ndarray  # (N,) flat indices
+    _last_actions: np.ndarray
+    _finished: np.ndarray
+    _blocked: np.ndarray
+
+    # (S,) index of the agent in every cell, -1 when empty. Only filled in `_resolve`.
+    _occupant: np.ndarray
+
+    def __init__(
+        self,
+        world: GridWorld,
+        n_agents: int,
+        init_positions: Optional[Iterable[Tuple[int, int]]] = None,
+        agent_goals: Optional[Iterable[Tuple[int, int]]] = None,
+        termination: str = "any",
+        seed: Optional[Union[int, npr.Generator]] = None,
+    ):
+        """
+        Args:
+            world: The grid-world.
+            n_agents: Number of agents.
+            init_positions: Distinct start cells of the agents. Defaults to the
+                `n_agents` non-terminal cells closest to `world.init_pos`.
+            agent_goals: The goal of every agent. By default, any goal of the world
+                is a goal of every agent. With agent goals, an agent gets the reward
+                of a goal only for reaching its own goal, and nothing for entering
+                the other goal cells.
+            termination: "any" or "all", see above.
+            seed: Seed of the slips.
+        """
+        if termination not in TERMINATIONS:
+            raise ValueError(
+                "Termination must be one of {}. Got {}".format(
+                    ", ".join(TERMINATIONS), termination
+                )
+            )
+        if n_agents < 1:
+            raise ValueError("Need at least one agent. Got {}".format(n_agents))
+        self._termination = termination
+
+        if init_positions is None:
+            positions = self._default_positions(world, n_agents)
+        else:
+            rows, cols = _as_cells(init_positions)
+            positions = rows * world.cols + cols
+            if len(positions) != n_agents:
+                raise ValueError(
+                    "Expected {} initial positions. Got {}".format(
+                        n_agents, len(positions)
+                    )
+                )
+            if len(np.unique(positions)) != n_agents:
+                raise ValueError("The initial positions of the agents must differ")
+        self._init_positions = positions
+
+        self._agent_goals = None
+        if agent_goals is not None:
+            rows, cols = _as_cells(agent_goals)
+            if len(rows) != n_agents:
+                raise ValueError(
+                    "Expected {} goals. Got {}".format(n_agents, len(rows))
+                )
+            self._agent_goals = rows * world.cols + cols
+
+        self._world = world
+        self._n_agents = n_agents
+        self._slips = BatchedGridWorld(world, n_agents, seed=seed, auto_reset=False)
+        self._occupant = np.full(world.n_states, -1, dtype=np.int64)
+        self._last_actions = np.full(n_agents, int(Actions.NO_OP), dtype=np.int64)
+        self.reset()
+
+    @staticmethod
+    def _default_positions(world: GridWorld, n_agents: int) -> np.ndarray:
+        distances = world.distances_from([world.init_pos]).reshape(-1)
+        cells = np.flatnonzero((distances >= 0) & ~world.terminal_mask)
+        if len(cells) < n_agents:
+            raise ValueError(
+                "Only {} cells are reachable from {} for {} agents".format(
+                    len(cells), world.init_pos, n_agents
+                )
+            )
+        order = np.argsort(distances[cells], kind="stable")
+        return cells[order[:n_agents]].astype(np.int64)
+
+    @property
+    def world(self) -> GridWorld:
+        return self._world
+
+    @property
+    def n_agents(self) -> int:
+        return self._n_agents
+
+    @property
+    def current_states(self) -> np.ndarray:
+        """(n_agents, 2) array with the (row, col) position of every agent."""
+        return self._world.index_to_state(self._pos)
+
+    @property
+    def last_actions(self) -> np.ndarray:
+        """Actions executed (after slipping) in the last `step`, `NO_OP` for the
+        agents that had finished."""
+        return self._last_actions
+
+    @property
+    def termination(self) -> str:
+        return self._termination
+
+    @property
+    def finished(self) -> np.ndarray:
+        """(n_agents,) boolean array of the agents that reached a goal or obstacle."""
+        return self._finished
+
+    @property
+    def blocked(self) -> np.ndarray:
+        """(n_agents,) boolean array of the agents blocked in the last `step`."""
+        return self._blocked
+
+    def reset(self) -> np.ndarray:
+        """Moves the agents back to their initial positions.
+
+        Only the whole team can be reset, as single agents moved back could collide
+        with the others.
+        """
+        self._pos = self._init_positions.copy()
+        self._finished = np.zeros(self._n_agents, dtype=bool)
+        self._blocked = np.zeros(self._n_agents, dtype=bool)
+        return self.current_states
+
+    def render(
+        self, cell_size: int = 8, trajectories: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """(rows * cell_size, cols * cell_size, 3) `uint8` RGB image with all agents
+        that have not finished.
+
+        `trajectories` are (n_agents, T) flat state indices to highlight, padded
+        with -1.
+        """
+        if trajectories is not None:
+            trajectories = np.asarray(trajectories).reshape(1, -1)
+        agents = self._pos[~self._finished][None]
+        return render_batch(self._world.grid, agents, cell_size, trajectories)[0]
+
+    def seed(self, seed: Optional[Union[int, npr.Generator]] = None):
+        self._slips.seed(seed)
+
+    def _resolve(
+        self, pos: np.ndarray, targets: np.ndarray, active: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Keeps the agents whose move conflicts with another agent in place.
+
+        Returns:
+            The resolved targets, and which agents were blocked.
+        """
+        agents = np.arange(self._n_agents)
+        candidates = agents[active]
+        moving = active & (targets != pos)
+        blocked = np.zeros(self._n_agents, dtype=bool)
+
+        occupant = self._occupant
+        occupant[pos[candidates]] = candidates
+        try:
+            while True:
+                # Head-on swaps with the agent in the target cell
+                other = occupant[targets[candidates]]
+                mover = candidates[(other >= 0) & (other != candidates)]
+                other = occupant[targets[mover]]
+                swaps = mover[
+                    moving[mover] & moving[other] & (targets[other] == pos[mover])
+                ]
+                conflicts = np.zeros(self._n_agents, dtype=bool)
+                conflicts[swaps] = True
+
+                # Several agents moving into the same cell: sort by target cell, then
+                # staying agents first, then by index, and keep the first of each cell
+                order = np.lexsort(
+                    (candidates, moving[candidates], targets[candidates])
+                )
+                ranked = candidates[order]
+                ranked_targets = targets[ranked]
+                first = np.ones(len(ranked), dtype=bool)
+                first[1:] = ranked_targets[1:] != ranked_targets[:-1]
+                conflicts[ranked[~first]] = True
+
+                conflicts &= moving
+                if not conflicts.any():
+                    break
+                targets = np.where(conflicts, pos, targets)
+                moving &= ~conflicts
+                blocked |= conflicts
+        finally:
+            occupant[pos[candidates]] = -1
+        return targets, blocked
+
+    def step(self, actions: np.ndarray) -> Tuple[np.ndarray, np.ndarray, bool]:
+        """Moves all agents at once.
+
+        Returns:
+            The (n_agents, 2) positions of the agents, their (n_agents,) rewards, and
+            whether the episode is done. Finished agents get a reward of 0.
+        """
+        world = self._world
+        slips = self._slips
+        actions = slips._check_actions(actions)
+        p_actions = slips._execute(actions, slips._choose_outcomes())
+        active = ~self._finished
+
+        pos = self._pos
+        targets = np.where(active, world.move_table[pos, p_actions], pos)
+        next_pos, self._blocked = self._resolve(pos, targets, active)
+
+        rewards = world.reward_vector[next_pos]
+        if self._agent_goals is not None:
+            goals = world.goal_mask.reshape(-1)[next_pos]
+            rewards = np.where(
+                next_pos == self._agent_goals,
+                _CELL_REWARDS[States.GOAL],
+                np.where(goals, 0.0, rewards),
+            )
+        if world.reward_function is not None:
+            rewards = rewards + world.reward_function(pos, actions, next_pos)
+        rewards = np.where(active, rewards, 0).astype(np.float32)
+
+        hit_obstacle = active & world.obstacle_mask.reshape(-1)[next_pos]
+        if self._agent_goals is None:
+            reached = world.goal_mask.reshape(-1)[next_pos]
+        else:
+            reached = next_pos == self._agent_goals
+        reached &= active
+        self._finished = self._finished | reached | hit_obstacle
+
+        if self._termination == "any":
+            done = bool(reached.any() or hit_obstacle.any())
+        else:
+            done = bool(self._finished.all() or hit_obstacle.any())
+
+        self._last_actions = np.where(active, p_actions, int(Actions.NO_OP))
+        self._pos = next_pos
+        return (world.index_to_state(next_pos), rewards, done)
@@ -0,0 +1,183 @@
+"""Tasks where the agent has to visit every goal of a grid-world.
+
+This is scenario B of `GridWorld.done_function`. The goals visited so far are kept as
+an integer bitmask, where bit `i` is set once goal `i` was entered, so the state of
+the task is a (cell, mask) pair. The product state space has `n_states * 2 ** G`
+states for G goals, indexed as `mask * n_states + cell`, and `transition_model`
+describes it in the same compact form as `GridWorld.transition_model`, so the
+solvers plan over it directly:
+
+    task = MultiGoalTask(world)
+    policy, values = solvers.value_iteration(task.transition_model)
+    a = policy[task.state_to_index(task.current_state, task.visited)]
+"""
+from typing import List, Tuple, Union, Iterable, Optional
+
+import numpy as np
+
+from discrete_world.grid import (
+    Actions,
+    GridWorld,
+    TransitionModel,
+    index_dtype,
+    _as_cells,
+)
+
+# Product state spaces grow as 2 ** G, so the number of goals is limited.
+MAX_GOALS = 16
+
+
+class MultiGoalTask:
+    """Visit all `goals` of a world in any order, without entering an obstacle.
+
+    The goals are not terminal in this task. Entering a goal for the first time
+    gives the reward of its cell, and entering an already visited goal gives no
+    reward. The episode ends once all goals are visited, or on an obstacle.
+
+    The transition model is built from the world when it is first used, and is not
+    updated by later edits of the world.
+    """
+
+    _world: GridWorld
+    _goals: List[Tuple[int, int]]
+    _goal_bits: np.ndarray  # (S,) bit of the goal in every cell, 0 elsewhere
+    _model: Optional[TransitionModel]
+
+    # Current state
+    _visited: int
+
+    def __init__(
+        self, world: GridWorld, goals: Optional[Iterable[Tuple[int, int]]] = None
+    ):
+        """
+        Args:
+            world: The grid-world the agent moves in.
+            goals: The goals to visit, in the order of their bits. Defaults to the
+                goals of the world, sorted by position.
+        """
+        if goals is None:
+            goals = sorted(world.goals)
+        rows, cols = _as_cells(goals)
+        if len(rows) > MAX_GOALS:
+            raise ValueError(
+                "At most {} goals are supported. Got {}".format(MAX_GOALS, len(rows))
+            )
+        self._world = world
+        self._goals = list(zip(rows.tolist(), cols.tolist()))
+        self._goal_bits = np.zeros(world.n_states, dtype=np.int64)
+        self._goal_bits[rows * world.cols + cols] = 1 << np.arange(len(rows))
+        self._model = None
+        self.reset()
+
+    @property
+    def world(self) -> GridWorld:
+        return self._world
+
+    @property
+    def goals(self) -> List[Tuple[int, int]]:
+        return self._goals
+
+    @property
+    def n_goals(self) -> int:
+        return len(self._goals)
+
+    @property
+    def n_masks(self) -> int:
+        return 1 << self.n_goals
+
+    @property
+    def full_mask(self) -> int:
+        """Mask of the visited goals once every goal was visited."""
+        return self.n_masks - 1
+
+    @property
+    def goal_bits(self) -> np.ndarray:
+        """(S,) array with the bit of the goal in every cell, 0 for other cells."""
+        return self._goal_bits
+
+    @property
+    def n_states(self) -> int:
+        return self._world.n_states * self.n_masks
+
+    @property
+    def n_actions(self) -> int:
+        return self._world.n_actions
+
+    def state_to_index(
+        self, state: Tuple[int, int], mask: Union[int, np.ndarray]
+    ) -> Union[int, np.ndarray]:
+        """Flat index `mask * world.n_states + cell` of a (state, mask) pair.
+
+        `state` can also be an (..., 2) array of states, with an array of masks.
+        """
+        cell = self._world.state_to_index(state)
+        return mask * self._world.n_states + cell
+
+    def index_to_state(
+        self, idx: Union[int, np.ndarray]
+    ) -> Tuple[Union[Tuple[int, int], np.ndarray], Union[int, np.ndarray]]:
+        """(state, mask) pair of a flat index, or arrays of them."""
+        mask, cell = np.divmod(idx, self._world.n_states)
+        if np.ndim(idx) == 0:
+            return self._world.index_to_state(int(cell)), int(mask)
+        return self._world.index_to_state(cell), mask
+
+    @property
+    def current_state(self) -> Tuple[int, int]:
+        """(row, col) state of the agent, also in `GridWorld.flat_states` mode."""
+        return divmod(self._world.current_index, self._world.cols)
+
+    @property
+    def visited(self) -> int:
+        """Mask of the goals visited in the current episode."""
+        return self._visited
+
+    def reset(self) -> Tuple[int, int, int]:
+        """Resets the world, and returns the (row, col, mask) observation."""
+        self._world.reset()
+        self._visited = 0
+        row, col = self.current_state
+        return (row, col, self._visited)
+
+    def step(self, action: Actions) -> Tuple[Tuple[int, int, int], float, bool]:
+        """Steps the world, and returns the (row, col, mask) observation, the reward
+        and done."""
+        world = self._world
+        _, reward, _ = world.step(action)
+        cell = world.current_index
+        bit = self._goal_bits.item(cell)
+        if bit:
+            if self._visited & bit:
+                reward = 0.0
+            self._visited |= bit
+        done = self._visited == self.full_mask or world.obstacle_mask.item(cell)
+        row, col = divmod(cell, world.cols)
+        return ((row, col, self._visited), reward, done)
+
+    @property
+    def transition_model(self) -> TransitionModel:
+        """(S * 2 ** G, A, K) transition model over the product state space."""
+        if self._model is None:
+            model = self._world.transition_model
+            n_cells = self._world.n_states
+            masks = np.arange(self.n_masks).reshape(-1, 1, 1, 1)
+
+            # (M, S, A, K) next masks and product states
+            next_bits = self._goal_bits[model.next_states]
+            next_masks = masks | next_bits
+            next_states = next_masks * n_cells + model.next_states
+            revisit = (masks & next_bits) != 0
+            rewards = np.where(revisit, np.float32(0), model.rewards)
+
+            obstacles = self._world.obstacle_mask.reshape(-1)
+            terminal = obstacles[None, :] | (masks[:, :, 0, 0] == self.full_mask)
+
+            shape = (self.n_states,) + model.next_states.shape[1:]
+            next_states = next_states.reshape(shape)
+            self._model = TransitionModel(
+                next_states=next_states.astype(index_dtype(self.n_states)),
+                probs=np.broadcast_to(model.probs[:1, :, :], shape),
+                rewards=rewards.reshape(shape),
+                terminal=terminal.reshape(-1),
+            )
+        return self._model
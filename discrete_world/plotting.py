@@ -1,64 +1,234 @@
+"""Figures of grid-worlds and of the paths of agents through them.
+
+The figures are drawn on the Agg canvas of matplotlib without going through pyplot,
+so rendering works headless and no figures pile up in pyplot. A `FigureRenderer`
+creates its figure once, and only updates the image data and the path line for every
+world it renders. `render_envs` renders every world of a directory, optionally on a
+pool of processes:
+
+    python -m discrete_world.plotting envs figs --workers 4
+"""
+import pickle
+import argparse
+import multiprocessing
 from pathlib import Path
+from typing import Dict, List, Tuple, Union, Iterable, Optional
 
 import numpy as np
-import matplotlib.pyplot as plt
+from matplotlib.lines import Line2D
+from matplotlib.image import AxesImage
+from matplotlib.figure import Figure
+from matplotlib.colorbar import Colorbar
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 
+from discrete_world.grid import GridWorld
 
-def gen_plots(agent, fig_dir: Path, env_file: Path):
-    # plt.matshow(global_rewards, cmap='viridis'), plt.colorbar()
 
-    n_rows = agent.world.rows
-    n_cols = agent.world.cols
-    reward = np.array(agent.world.reward)
-
-    G = np.zeros_like(agent.world.grid, dtype=float)
+def grid_image(world: GridWorld) -> np.ndarray:
+    """(rows, cols) array of color intensities for the start, goals and obstacles."""
+    G = np.zeros(world.size, dtype=float)
     # This is just to set the color intensity level for the state features
-    G[agent.world.init_pos[0]][agent.world.init_pos[1]] = 2
-    for goal_pos in agent.world.goals:
-        G[goal_pos[0]][goal_pos[1]] = 10
-    for state in agent.world.obstacles:
-        G[state[0]][state[1]] = -10
-
-    # Store
-    visit_path = []
-    for state in agent.states:
-        visit_path.append(state)
-
-    # Plotting
-    fig, axs = plt.subplots(1, 2, figsize=(16, 12))
-    fig.suptitle("Policy", fontsize=20)
-
-    h1 = axs[0].imshow(reward, cmap="Blues", extent=[0, n_rows, 0, n_cols])
-    axs[0].set_title("Reward", fontsize=20)
-    # Major ticks
-    axs[0].set_xticks(np.arange(0, n_rows, 1))
-    axs[0].set_yticks(np.arange(0, n_cols, 1))
-    axs[0].grid(which="major", color="k", linewidth=2)
-    fig.colorbar(h1, ax=axs[0], fraction=0.046, pad=0.04)
-
-    h2 = axs[1].matshow(G, cmap="RdBu", extent=[0, n_rows, 0, n_cols])
-    axs[1].set_title("Grid World", fontsize=20)
-    axs[1].set_xticks(np.arange(0, n_rows, 1))
-    axs[1].set_yticks(np.arange(0, n_cols, 1))
-    axs[1].grid(which="major", color="k", linewidth=2)
-    visit_path = np.array(visit_path, dtype=float)
-    x = visit_path[:, 0]
-    y = visit_path[:, 1]
-    x_ = y
-    y_ = n_rows - 1 - x
-    x_ += 0.5
-    y_ += 0.5
-    axs[1].plot(x_, y_, "-g^", linewidth=5, markersize=15, label="policy")
-    # fig.colorbar(h2, ax=axs[1])
-
-    # Optional plot: For more explicit indication of the agent states
-    # h3 = axs[2].matshow(visited, cmap='Greys', extent=[0, n_rows, 0, n_cols])
-    # axs[2].set_title('Trace')
-    # axs[2].set_xticks(np.arange(0, n_rows, 1))
-    # axs[2].set_yticks(np.arange(0, n_cols, 1))
-    # axs[2].grid(which='major', color='k', linewidth=2)
-    # fig.colorbar(h3, ax=axs[2])
-    plt.legend()
+    G[world.init_pos] = 2
+    G[world.goal_mask] = 10
+    G[world.obstacle_mask] = -10
+    return G
+
+
+class FigureRenderer:
+    """Draws the reward and the grid-world with a path, reusing one figure."""
+
+    def __init__(self, figsize: Tuple[float, float] = (16, 12)):
+        self._fig = Figure(figsize=figsize)
+        FigureCanvasAgg(self._fig)
+        self._axs = self._fig.subplots(1, 2)
+        self._fig.suptitle("Policy", fontsize=20)
+
+        # Artists, created by the first call to `render`
+        self._reward_image = None  # type: Optional[AxesImage]
+        self._grid_image = None  # type: Optional[AxesImage]
+        self._colorbar = None  # type: Optional[Colorbar]
+        self._path_line = None  # type: Optional[Line2D]
+
+    @property
+    def figure(self) -> Figure:
+        return self._fig
+
+    def _create_artists(
+        self, reward: np.ndarray, G: np.ndarray
+    ) -> Tuple[AxesImage, AxesImage, Colorbar, Line2D]:
+        if (
+            self._reward_image is None
+            or self._grid_image is None
+            or self._colorbar is None
+            or self._path_line is None
+        ):
+            axs = self._axs
+            self._reward_image = axs[0].imshow(reward, cmap="Blues")
+            axs[0].set_title("Reward", fontsize=20)
+            self._colorbar = self._fig.colorbar(
+                self._reward_image, ax=axs[0], fraction=0.046, pad=0.04
+            )
+
+            self._grid_image = axs[1].matshow(G, cmap="RdBu")
+            axs[1].set_title("Grid World", fontsize=20)
+            (self._path_line,) = axs[1].plot(
+                [], [], "-g^", linewidth=5, markersize=15, label="policy"
+            )
+            axs[1].legend()
+            for ax in axs:
+                ax.grid(which="major", color="k", linewidth=2)
+        return self._reward_image, self._grid_image, self._colorbar, self._path_line
+
+    def render(
+        self, world: GridWorld, path: np.ndarray, fig_path: Union[str, Path]
+    ) -> Path:
+        """Saves the figure of `world` and `path` to `fig_path`.
+
+        Args:
+            world: The grid-world.
+            path: (T, 2) array of (row, col) states, or (T,) array of flat state
+                indices, visited by the agent.
+            fig_path: Path of the image file to write.
+        """
+        n_rows, n_cols = world.size
+        reward = world.reward
+        G = grid_image(world)
+        reward_plot, grid_plot, colorbar, path_line = self._create_artists(reward, G)
+
+        extent = (0, n_cols, 0, n_rows)
+        for image, data in ((reward_plot, reward), (grid_plot, G)):
+            image.set_data(data)
+            image.set_extent(extent)
+            image.autoscale()
+        colorbar.update_normal(reward_plot)
+        for ax in self._axs:
+            ax.set_xlim(0, n_cols)
+            ax.set_ylim(0, n_rows)
+            # Major ticks
+            ax.set_xticks(np.arange(0, n_cols, 1))
+            ax.set_yticks(np.arange(0, n_rows, 1))
+
+        path = np.asarray(path)
+        if path.ndim == 1:
+            path = world.index_to_state(path)
+        path = path.reshape(-1, 2).astype(float)
+        path_line.set_data(path[:, 1] + 0.5, n_rows - 1 - path[:, 0] + 0.5)
+
+        fig_path = Path(fig_path)
+        self._fig.savefig(fig_path)
+        return fig_path
+
+
+# Renderer of this process, reused by `gen_plots` and the `render_envs` workers
+_RENDERER = None  # type: Optional[FigureRenderer]
+
+
+def _renderer() -> FigureRenderer:
+    global _RENDERER
+    if _RENDERER is None:
+        _RENDERER = FigureRenderer()
+    return _RENDERER
+
+
+def gen_plots(agent, fig_dir: Path, env_file: Path):
+    """Saves the figure of the world and visited states of an `Agent` as
+    `fig_dir / <env name>.png`."""
     env_name = env_file.stem
     fig_path = fig_dir / (env_name + ".png")
-    plt.savefig(fig_path)
+    _renderer().render(agent.world, np.array(agent.states), fig_path)
+
+
+def load_world(filepath: Union[str, Path]) -> GridWorld:
+    """Reads a grid-world from an .env file, or a binary .world file."""
+    if Path(filepath).suffix == ".world":
+        return GridWorld.load(filepath)
+    with open(filepath, "rb") as data_file:
+        return pickle.load(data_file)
+
+
+def policy_path(
+    world: GridWorld,
+    policy: Optional[np.ndarray] = None,
+    n_steps: int = 50,
+    seed: Optional[int] = None,
+) -> np.ndarray:
+    """(T, 2) states visited from `init_pos` when following `policy`.
+
+    Without a policy, the optimal policy of `solvers.value_iteration` is followed.
+    The path ends after `n_steps` steps or at a terminal state. The world is seeded
+    with `seed` for the slips, and reset afterwards.
+    """
+    if policy is None:
+        from discrete_world import solvers
+
+        policy, _ = solvers.value_iteration(world)
+    world.seed(seed)
+    world.reset()
+    states = [world.current_index]
+    for _ in range(n_steps):
+        _, _, done = world.step(int(policy[states[-1]]))
+        states.append(world.current_index)
+        if done:
+            break
+    world.reset()
+    return world.index_to_state(np.array(states))
+
+
+def _render_file(task: Tuple[Path, Path, int, Optional[int]]) -> Path:
+    env_file, fig_path, n_steps, seed = task
+    world = load_world(env_file)
+    return _renderer().render(world, policy_path(world, None, n_steps, seed), fig_path)
+
+
+def render_envs(
+    env_dir: Union[str, Path],
+    fig_dir: Union[str, Path],
+    n_workers: int = 1,
+    n_steps: int = 50,
+    seed: Optional[int] = 0,
+    patterns: Iterable[str] = ("*.env", "*.world"),
+) -> List[Path]:
+    """Renders every world file in `env_dir` to `fig_dir / <name>.png`.
+
+    The figure shows the path of the optimal policy from `init_pos` (see
+    `policy_path`). With more than one worker, the files are rendered on a pool of
+    processes, each reusing its own figure. Files with the same name, like the
+    `.env` and `.world` files that `convert` writes, are rendered once, from the
+    `.world` file.
+
+    Returns:
+        The paths of the written figures.
+    """
+    env_dir, fig_dir = Path(env_dir), Path(fig_dir)
+    fig_dir.mkdir(parents=True, exist_ok=True)
+    env_files = {}  # type: Dict[str, Path]
+    for f in sorted(set(f for p in patterns for f in env_dir.glob(p))):
+        if f.stem not in env_files or f.suffix == ".world":
+            env_files[f.stem] = f
+    tasks = [
+        (f, fig_dir / (stem + ".png"), n_steps, seed)
+        for stem, f in sorted(env_files.items())
+    ]
+
+    if n_workers <= 1 or len(tasks) <= 1:
+        return [_render_file(task) for task in tasks]
+    with multiprocessing.Pool(min(n_workers, len(tasks))) as pool:
+        return list(pool.imap(_render_file, tasks))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Render all grid-worlds of a directory"
+    )
+    parser.add_argument("env_dir", type=Path, help="Directory of .env/.world files")
+    parser.add_argument("fig_dir", type=Path, help="Directory to write the figures to")
+    parser.add_argument(
+        "-j", "--workers", type=int, default=1, help="Number of worker processes"
+    )
+    parser.add_argument(
+        "-n", "--steps", type=int, default=50, help="Maximum length of the paths"
+    )
+    args = parser.parse_args()
+
+    for fig_path in render_envs(args.env_dir, args.fig_dir, args.workers, args.steps):
+        print(fig_path)
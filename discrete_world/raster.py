@@ -0,0 +1,126 @@
+"""Raster images of grid-worlds, painted into NumPy RGB arrays.
+
+Every cell becomes a `cell_size` x `cell_size` block of pixels colored by its
+`States`, the cells of trajectories are highlighted, and agents are drawn as squares
+inside their cells. Everything is done with array indexing, so that frames can be
+rendered fast enough to log videos of rollouts. `render_batch` renders one frame per
+environment of a batch at once.
+"""
+from typing import Optional
+
+import numpy as np
+
+from discrete_world.grid import States
+
+# RGB color of every `States`
+PALETTE = np.zeros((len(States), 3), dtype=np.uint8)
+PALETTE[States.EMPTY] = (255, 255, 255)
+PALETTE[States.START] = (173, 216, 230)
+PALETTE[States.GOAL] = (46, 160, 67)
+PALETTE[States.OBSTACLE] = (64, 64, 64)
+
+AGENT_COLOR = np.array([220, 40, 40], dtype=np.uint8)
+TRAJECTORY_COLOR = np.array([250, 200, 60], dtype=np.uint8)
+LINE_COLOR = np.array([200, 200, 200], dtype=np.uint8)
+
+
+def render_batch(
+    grid: np.ndarray,
+    agents: Optional[np.ndarray] = None,
+    cell_size: int = 8,
+    trajectories: Optional[np.ndarray] = None,
+    grid_lines: bool = True,
+) -> np.ndarray:
+    """Renders B frames of grid-worlds.
+
+    Args:
+        grid: (rows, cols) grid of `States` shared by all frames, or (B, rows, cols)
+            grids, one per frame.
+        agents: (B,) or (B, N) flat state indices of the agents in every frame.
+        cell_size: Side of a cell in pixels.
+        trajectories: (B, T) flat state indices of the cells to highlight in every
+            frame. Negative entries are ignored, so trajectories of different
+            lengths can be padded with -1.
+        grid_lines: Whether to draw lines between the cells, for cells of at least
+            4 pixels.
+
+    Returns:
+        (B, rows * cell_size, cols * cell_size, 3) `uint8` array of RGB frames.
+    """
+    if cell_size < 1:
+        raise ValueError("Cell size must be >= 1. Got {}".format(cell_size))
+    grid = np.asarray(grid)
+    rows, cols = grid.shape[-2:]
+    if agents is not None:
+        agents = np.asarray(agents).reshape(len(agents), -1)
+        n_frames = len(agents)
+    elif trajectories is not None:
+        n_frames = len(trajectories)
+    else:
+        n_frames = grid.shape[0] if grid.ndim == 3 else 1
+
+    # (B, rows, cols, 3) colors of the cells, or (1, rows, cols, 3) when all frames
+    # share them
+    cells = PALETTE[grid].reshape(-1, rows, cols, 3)
+    if trajectories is not None:
+        trajectories = np.asarray(trajectories).reshape(n_frames, -1)
+        frames, steps = np.nonzero(trajectories >= 0)
+        r, c = np.divmod(trajectories[frames, steps], cols)
+        cells = np.broadcast_to(cells, (n_frames, rows, cols, 3)).copy()
+        cells[frames, r, c] = TRAJECTORY_COLOR
+
+    # Every cell becomes a block of pixels with a single broadcast copy
+    size = (len(cells), rows * cell_size, cols * cell_size, 3)
+    blocks = cells[:, :, None, :, None, :]
+    images = np.broadcast_to(
+        blocks, (len(cells), rows, cell_size, cols, cell_size, 3)
+    ).reshape(size)
+    if not images.flags.writeable:
+        # Blocks of one pixel reshape to a read-only view instead of a copy
+        images = images.copy()
+    if grid_lines and cell_size >= 4:
+        images[:, ::cell_size, :] = LINE_COLOR
+        images[:, :, ::cell_size] = LINE_COLOR
+    if len(images) != n_frames:
+        images = np.broadcast_to(images, (n_frames,) + size[1:]).copy()
+
+    if agents is not None:
+        frames = np.repeat(np.arange(n_frames), agents.shape[1])
+        r, c = np.divmod(agents.reshape(-1), cols)
+        margin = cell_size // 4
+        offsets = np.arange(margin, cell_size - margin)
+        y = r[:, None] * cell_size + offsets  # (M, k) pixel rows of every agent
+        x = c[:, None] * cell_size + offsets
+        images[frames[:, None, None], y[:, :, None], x[:, None, :]] = AGENT_COLOR
+    return images
+
+
+def render_grid(
+    grid: np.ndarray,
+    agents: Optional[np.ndarray] = None,
+    cell_size: int = 8,
+    trajectory: Optional[np.ndarray] = None,
+    grid_lines: bool = True,
+) -> np.ndarray:
+    """Renders one frame of a grid-world.
+
+    Args:
+        grid: (rows, cols) grid of `States`.
+        agents: (N, 2) (row, col) positions of the agents.
+        cell_size: Side of a cell in pixels.
+        trajectory: (T, 2) states, or (T,) flat state indices, to highlight.
+        grid_lines: See `render_batch`.
+
+    Returns:
+        (rows * cell_size, cols * cell_size, 3) `uint8` RGB image.
+    """
+    cols = np.shape(grid)[-1]
+    if agents is not None:
+        agents = np.asarray(agents).reshape(-1, 2)
+        agents = (agents[:, 0] * cols + agents[:, 1])[None]
+    if trajectory is not None:
+        trajectory = np.asarray(trajectory)
+        if trajectory.ndim == 2:
+            trajectory = trajectory[:, 0] * cols + trajectory[:, 1]
+        trajectory = trajectory[None]
+    return render_batch(grid, agents, cell_size, trajectory, grid_lines)[0]
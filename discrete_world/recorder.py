@@ -0,0 +1,175 @@
+"""Recording of grid-world experience to disk, and streaming it back.
+
+A `TrajectoryRecorder` wraps a `GridWorld` and buffers every step in fixed-size NumPy
+arrays. Full buffers are written as numbered `chunk_XXXXXX.npz` files to a directory,
+which is only ever appended to. `iter_episodes` reads the chunks back one at a time
+and yields complete episodes, so datasets larger than memory can be streamed.
+"""
+import os
+from pathlib import Path
+from typing import Dict, List, Tuple, Union, Iterator, NamedTuple
+
+import numpy as np
+
+from discrete_world.grid import Actions, GridWorld, index_dtype
+
+CHUNK_PATTERN = "chunk_{:06d}.npz"
+
+
+class Episode(NamedTuple):
+    """The steps of one recorded episode. States are flat state indices."""
+
+    states: np.ndarray  # (T,) int
+    actions: np.ndarray  # (T,) int8 chosen actions
+    slipped_actions: np.ndarray  # (T,) int8 actions actually executed
+    rewards: np.ndarray  # (T,) float32
+    dones: np.ndarray  # (T,) bool
+    next_states: np.ndarray  # (T,) int
+
+
+def _chunk_files(directory: Path):
+    return sorted(directory.glob(CHUNK_PATTERN.replace("{:06d}", "[0-9]" * 6)))
+
+
+class TrajectoryRecorder:
+    """Records the steps taken through `step` in a directory of chunk files.
+
+    Every call to `reset` starts a new episode. Recording into a directory that
+    already has chunks appends to it, continuing the chunk and episode numbering.
+    """
+
+    _world: GridWorld
+    _directory: Path
+    _chunk_size: int
+
+    _n_chunks: int
+    _episode: int
+    _episode_steps: int
+
+    # Step buffers
+    _size: int
+    _buffers: Dict[str, np.ndarray]
+
+    def __init__(
+        self, world: GridWorld, directory: Union[str, Path], chunk_size: int = 65536
+    ):
+        self._world = world
+        self._directory = Path(directory)
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self._chunk_size = chunk_size
+
+        chunks = _chunk_files(self._directory)
+        self._n_chunks = len(chunks)
+        self._episode = 0
+        if chunks:
+            with np.load(chunks[-1]) as last_chunk:
+                self._episode = int(last_chunk["episodes"][-1]) + 1
+        self._episode_steps = 0
+
+        state_dtype = index_dtype(world.n_states)
+        self._buffers = {
+            "episodes": np.empty(chunk_size, dtype=np.int64),
+            "states": np.empty(chunk_size, dtype=state_dtype),
+            "actions": np.empty(chunk_size, dtype=np.int8),
+            "slipped_actions": np.empty(chunk_size, dtype=np.int8),
+            "rewards": np.empty(chunk_size, dtype=np.float32),
+            "dones": np.empty(chunk_size, dtype=bool),
+            "next_states": np.empty(chunk_size, dtype=state_dtype),
+        }
+        self._size = 0
+
+    @property
+    def world(self) -> GridWorld:
+        return self._world
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    def reset(self) -> Union[Tuple[int, int], int]:
+        """Resets the world and starts a new episode."""
+        if self._episode_steps:
+            self._episode += 1
+            self._episode_steps = 0
+        self._world.reset()
+        return self._world.current_state
+
+    def step(
+        self, action: Union[Actions, int]
+    ) -> Tuple[Union[Tuple[int, int], int], float, bool]:
+        """Steps the world like `GridWorld.step`, and records the step."""
+        world = self._world
+        state = world.current_index
+        next_state, reward, done = world.step(action)
+
+        i = self._size
+        buffers = self._buffers
+        buffers["episodes"][i] = self._episode
+        buffers["states"][i] = state
+        buffers["actions"][i] = action
+        buffers["slipped_actions"][i] = world.last_action
+        buffers["rewards"][i] = reward
+        buffers["dones"][i] = done
+        buffers["next_states"][i] = world.current_index
+        self._size += 1
+        self._episode_steps += 1
+        if self._size == self._chunk_size:
+            self.flush()
+        return (next_state, reward, done)
+
+    def flush(self):
+        """Writes the buffered steps to a new chunk file."""
+        if self._size == 0:
+            return
+        path = self._directory / CHUNK_PATTERN.format(self._n_chunks)
+        # Write to a temporary file first, so readers never see partial chunks
+        tmp_path = path.with_name(path.stem + ".tmp.npz")
+        arrays = {
+            k: v[: self._size] for k, v in self._buffers.items()
+        }  # type: Dict[str, np.ndarray]
+        np.savez(tmp_path, **arrays)  # type: ignore[arg-type]
+        os.replace(tmp_path, path)
+        self._n_chunks += 1
+        self._size = 0
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self) -> "TrajectoryRecorder":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_episodes(directory: Union[str, Path]) -> Iterator[Episode]:
+    """Yields the episodes recorded in `directory`, in order.
+
+    Only one chunk, plus the part of an episode that continues into the next chunk,
+    is held in memory at a time.
+    """
+    pending = []  # type: List[Episode]  # parts of the current episode
+    pending_episode = None
+    for path in _chunk_files(Path(directory)):
+        with np.load(path) as chunk:
+            arrays = {k: chunk[k] for k in chunk.files}
+        episodes = arrays.pop("episodes")
+        starts = np.flatnonzero(np.diff(episodes)) + 1
+        bounds = np.concatenate([[0], starts, [len(episodes)]])
+
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            part = Episode(**{k: v[start:end] for k, v in arrays.items()})
+            if pending and episodes[start] != pending_episode:
+                yield _join(pending)
+                pending = []
+            pending.append(part)
+            pending_episode = episodes[start]
+
+    if pending:
+        yield _join(pending)
+
+
+def _join(parts: List[Episode]) -> Episode:
+    if len(parts) == 1:
+        return parts[0]
+    return Episode(*(np.concatenate(arrays) for arrays in zip(*parts)))
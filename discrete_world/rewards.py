@@ -0,0 +1,105 @@
+"""Reward functions over transitions, for `GridWorld.set_reward_function`.
+
+A reward function is called as `reward_fn(states, actions, next_states)` with
+broadcastable arrays of flat state indices, chosen actions and next state indices,
+and returns the rewards of these transitions. They are added to the reward of the
+entered cells, and are evaluated once over all transitions of the world, so they
+should be written with array operations.
+
+Example, a step cost and shaping towards the goals:
+
+    world.set_reward_function(
+        RewardSum(StepCost(0.01), PotentialShaping(distance_potential(world), 0.95))
+    )
+
+The functions here are classes rather than closures so that worlds using them can
+still be pickled.
+"""
+from typing import Callable, Optional
+
+import numpy as np
+
+from discrete_world.grid import GridWorld
+
+
+class StepCost:
+    """Constant reward of `-cost` on every transition."""
+
+    def __init__(self, cost: float):
+        self.cost = cost
+
+    def __call__(
+        self, states: np.ndarray, actions: np.ndarray, next_states: np.ndarray
+    ) -> np.ndarray:
+        shape = np.broadcast(states, actions, next_states).shape
+        return np.full(shape, -self.cost, dtype=np.float32)
+
+
+class PotentialShaping:
+    """Potential-based shaping reward `gamma * potential(s') - potential(s)`.
+
+    Shaping with the same `gamma` as the solver or learner does not change the
+    optimal policies (Ng et al., 1999). The potential of terminal next states is
+    taken as 0, so that episodes ending anywhere are shaped consistently.
+    """
+
+    def __init__(
+        self,
+        potential: np.ndarray,
+        gamma: float,
+        terminal: Optional[np.ndarray] = None,
+    ):
+        """
+        Args:
+            potential: (rows, cols) or (S,) potential of every state.
+            gamma: Discount factor.
+            terminal: (S,) mask of the terminal states, e.g. `world.terminal_mask`.
+        """
+        self.potential = np.asarray(potential, dtype=np.float32).reshape(-1)
+        self.gamma = gamma
+        if terminal is not None:
+            terminal = np.array(terminal, dtype=bool).reshape(-1)
+        self.terminal = terminal
+
+    def __call__(
+        self, states: np.ndarray, actions: np.ndarray, next_states: np.ndarray
+    ) -> np.ndarray:
+        next_potential = self.potential[next_states]
+        if self.terminal is not None:
+            next_potential = np.where(self.terminal[next_states], 0, next_potential)
+        return self.gamma * next_potential - self.potential[states]
+
+
+class RewardSum:
+    """Sum of several reward functions."""
+
+    def __init__(self, *reward_fns: Callable):
+        self.reward_fns = reward_fns
+
+    def __call__(
+        self, states: np.ndarray, actions: np.ndarray, next_states: np.ndarray
+    ) -> np.ndarray:
+        return sum(fn(states, actions, next_states) for fn in self.reward_fns)
+
+
+def distance_potential(world: GridWorld, scale: float = 1.0) -> np.ndarray:
+    """(rows, cols) potential of `-scale` times the number of moves to a goal.
+
+    Cells that cannot reach a goal get the potential of the farthest cell that can,
+    minus `scale`. The potential is computed from the current `goal_distances`, and
+    is not updated by later edits of the world.
+    """
+    distances = world.goal_distances.astype(np.float32)
+    unreachable = distances < 0
+    distances[unreachable] = distances.max(initial=0) + 1
+    return -scale * distances
+
+
+def shaped_reward(
+    world: GridWorld, gamma: float, step_cost: float = 0.0, scale: float = 1.0
+) -> RewardSum:
+    """Step cost plus potential-based shaping with `distance_potential`."""
+    shaping = PotentialShaping(
+        distance_potential(world, scale), gamma, world.terminal_mask
+    )
+    return RewardSum(StepCost(step_cost), shaping)
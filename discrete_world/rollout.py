@@ -0,0 +1,184 @@
+"""Parallel collection of episodes over a process pool.
+
+The episodes are split into fixed-size shards, and every shard is seeded from its
+own `numpy.random.SeedSequence` child of the given seed. The collected trajectories
+therefore only depend on the seed and the shard size, not on the number of workers.
+The workers step their worlds with the fast path of `GridWorld.enable_fast_step`,
+in `GridWorld.flat_states` mode.
+"""
+import copy
+import multiprocessing
+from typing import Any, List, Tuple, Union, Optional, NamedTuple
+
+import numpy as np
+import numpy.random as npr
+
+from discrete_world.grid import GridWorld, index_dtype
+
+
+class Trajectories(NamedTuple):
+    """Steps of many episodes, stored back to back.
+
+    The steps of episode `i` are `offsets[i]:offsets[i + 1]`. States are flat state
+    indices (see `GridWorld.state_to_index`), and `dones[i]` tells whether episode
+    `i` ended in a terminal state rather than after `max_steps` steps.
+    """
+
+    states: np.ndarray  # (T,) int
+    actions: np.ndarray  # (T,) int8
+    rewards: np.ndarray  # (T,) float32
+    next_states: np.ndarray  # (T,) int
+    offsets: np.ndarray  # (E + 1,) int64
+    dones: np.ndarray  # (E,) bool
+
+    @property
+    def n_episodes(self) -> int:
+        return len(self.dones)
+
+    def returns(self) -> np.ndarray:
+        """(E,) undiscounted return of every episode."""
+        sums = np.concatenate([[0.0], np.cumsum(self.rewards, dtype=float)])
+        return sums[self.offsets[1:]] - sums[self.offsets[:-1]]
+
+    @classmethod
+    def concatenate(cls, parts: List["Trajectories"]) -> "Trajectories":
+        ends = np.cumsum([0] + [len(p.states) for p in parts])
+        offsets = [p.offsets[:-1] + end for p, end in zip(parts, ends)]
+        return cls(
+            states=np.concatenate([p.states for p in parts]),
+            actions=np.concatenate([p.actions for p in parts]),
+            rewards=np.concatenate([p.rewards for p in parts]),
+            next_states=np.concatenate([p.next_states for p in parts]),
+            offsets=np.concatenate(offsets + [ends[-1:]]).astype(np.int64),
+            dones=np.concatenate([p.dones for p in parts]),
+        )
+
+
+# Per-process copies, set once by `_init_worker`
+_WORKER_WORLD = None  # type: Optional[GridWorld]
+_WORKER_POLICY = None  # type: Optional[np.ndarray]
+
+
+def _init_worker(world: Any, policy: Optional[np.ndarray]):
+    """Sets the world of this process, attaching to it if it is a shared world."""
+    global _WORKER_WORLD, _WORKER_POLICY
+    if world is not None and not isinstance(world, GridWorld):
+        # Imported here, as shared memory needs Python 3.8
+        from discrete_world.shared import attach
+
+        world = attach(world)
+    if world is not None:
+        world.enable_fast_step()
+        world.flat_states = True
+    _WORKER_WORLD = world
+    _WORKER_POLICY = policy
+
+
+def _select_action(
+    policy: Optional[np.ndarray], n_actions: int, state: int, rng: npr.Generator
+) -> int:
+    if policy is None:
+        return int(rng.integers(n_actions))
+    if policy.ndim == 1:
+        return int(policy[state])
+    return int(rng.choice(policy.shape[1], p=policy[state]))
+
+
+def _collect_shard(task: Tuple[npr.SeedSequence, int, int]) -> Trajectories:
+    """Runs `n_episodes` episodes of at most `max_steps` steps in this process."""
+    seed_seq, n_episodes, max_steps = task
+    world, policy = _WORKER_WORLD, _WORKER_POLICY
+    assert world is not None, "The worker was initialized without a world"
+    env_seed, policy_seed = seed_seq.spawn(2)
+    world.seed(int(env_seed.generate_state(1)[0]))
+    rng = npr.default_rng(policy_seed)
+    n_actions = world.action_space.n
+
+    states, actions, rewards, next_states = [], [], [], []
+    offsets = [0]
+    dones = []
+    for _ in range(n_episodes):
+        world.reset()
+        s = world.current_index
+        done = False
+        for _ in range(max_steps):
+            a = _select_action(policy, n_actions, s, rng)
+            _, r, done = world.step(a)
+            s_ = world.current_index
+            states.append(s)
+            actions.append(a)
+            rewards.append(r)
+            next_states.append(s_)
+            s = s_
+            if done:
+                break
+        offsets.append(len(states))
+        dones.append(done)
+
+    dtype = index_dtype(world.n_states)
+    return Trajectories(
+        states=np.array(states, dtype=dtype),
+        actions=np.array(actions, dtype=np.int8),
+        rewards=np.array(rewards, dtype=np.float32),
+        next_states=np.array(next_states, dtype=dtype),
+        offsets=np.array(offsets, dtype=np.int64),
+        dones=np.array(dones, dtype=bool),
+    )
+
+
+def collect_rollouts(
+    world: Any,
+    n_episodes: int,
+    policy: Optional[np.ndarray] = None,
+    max_steps: int = 100,
+    n_workers: Optional[int] = None,
+    seed: Optional[Union[int, npr.SeedSequence]] = None,
+    shard_size: int = 1000,
+) -> Trajectories:
+    """Collects `n_episodes` episodes from `init_pos` on a pool of processes.
+
+    Args:
+        world: The grid-world, of which every worker receives one copy, or a
+            `discrete_world.shared.SharedWorld` that the workers attach to.
+        n_episodes: Number of episodes to collect.
+        policy: (S,) array of actions, (S, A) array of action probabilities over flat
+            state indices, or None for uniformly random actions.
+        max_steps: Episodes that have not terminated after this many steps are cut.
+        n_workers: Number of worker processes, defaults to the number of CPUs. With
+            a single worker, the episodes are collected in this process.
+        seed: Seed for the episodes.
+        shard_size: Number of episodes per task sent to a worker.
+
+    Returns:
+        The `Trajectories` of all episodes, in a deterministic order.
+    """
+    if policy is not None:
+        policy = np.asarray(policy)
+    seed_seq = seed if isinstance(seed, npr.SeedSequence) else npr.SeedSequence(seed)
+    if not isinstance(world, GridWorld):
+        world = world.handle
+
+    n_shards = max(1, -(-n_episodes // shard_size))
+    sizes = [min(shard_size, n_episodes - i * shard_size) for i in range(n_shards)]
+    tasks = [(s, n, max_steps) for s, n in zip(seed_seq.spawn(n_shards), sizes)]
+
+    n_workers = min(n_workers or multiprocessing.cpu_count(), n_shards)
+    if n_workers <= 1:
+        # Work on a copy, as the workers do, so the world's state and RNG are untouched
+        if isinstance(world, GridWorld):
+            world = copy.deepcopy(world)
+        _init_worker(world, policy)
+        try:
+            parts = [_collect_shard(task) for task in tasks]
+        finally:
+            _init_worker(None, None)
+            if not isinstance(world, GridWorld):
+                from discrete_world.shared import detach
+
+                detach(world)
+    else:
+        with multiprocessing.Pool(
+            n_workers, initializer=_init_worker, initargs=(world, policy)
+        ) as pool:
+            parts = list(pool.imap(_collect_shard, tasks))
+    return Trajectories.concatenate(parts)
@@ -0,0 +1,163 @@
+"""Grid-worlds whose arrays live in shared memory.
+
+`SharedWorld` publishes the grid, reward and transition arrays of a world once into
+`multiprocessing.shared_memory` blocks. Worker processes receive the small, picklable
+`SharedWorld.handle` and call `attach` to get a `GridWorld` that reads those blocks
+in place, and only owns its current position and RNG. `detach` closes those blocks
+again in a process that no longer needs them. Requires Python 3.8.
+
+Example:
+
+    with SharedWorld(world) as shared:
+        with multiprocessing.Pool(8, initializer=init, initargs=(shared.handle,)):
+            ...
+
+    def init(handle):
+        global WORLD
+        WORLD = attach(handle, seed=os.getpid())
+"""
+from multiprocessing import shared_memory
+from typing import Any, Dict, Tuple, Union, Optional, NamedTuple
+
+import numpy as np
+import numpy.random as npr
+
+from discrete_world.grid import GridWorld
+
+
+class SharedWorldHandle(NamedTuple):
+    """Everything a worker needs to attach to a `SharedWorld`."""
+
+    init_pos: Tuple[int, int]
+    p_slip: float
+    # Name of the array -> (shared memory block name, shape, dtype string)
+    blocks: Dict[str, Tuple[str, Tuple[int, ...], str]]
+    # `GridWorld.reward_function`, whose rewards are in the "rewards" block
+    reward_fn: Any = None
+
+
+# Blocks attached in this process, kept open since the attached worlds read from
+# them, until `detach` or `SharedWorld.unlink` closes them.
+_ATTACHED = {}  # type: Dict[str, shared_memory.SharedMemory]
+
+
+def _attach_array(name: str, shape: Tuple[int, ...], dtype: str) -> np.ndarray:
+    if name not in _ATTACHED:
+        _ATTACHED[name] = shared_memory.SharedMemory(name=name)
+    array = np.ndarray(shape, dtype=dtype, buffer=_ATTACHED[name].buf)
+    array.flags.writeable = False
+    return array
+
+
+def attach(
+    handle: SharedWorldHandle, seed: Optional[Union[int, npr.Generator]] = None
+) -> GridWorld:
+    """Creates a `GridWorld` backed by the shared arrays of a `SharedWorld`.
+
+    The arrays are read-only, so the attached world cannot be edited (e.g. with
+    `create_obstacles`). Changing its `p_slip` rebuilds its transition model in
+    private memory.
+    """
+    arrays = {
+        key: _attach_array(name, shape, dtype)
+        for key, (name, shape, dtype) in handle.blocks.items()
+    }
+    world = GridWorld.from_grid(
+        arrays.pop("grid"),
+        handle.init_pos,
+        handle.p_slip,
+        seed=seed,
+        reward=arrays.pop("reward"),
+    )
+    world.set_reward_function(handle.reward_fn)
+    world._preload_model(arrays.pop("move_table"), **arrays)
+    return world
+
+
+def detach(handle: SharedWorldHandle):
+    """Closes the blocks of `handle` attached in this process.
+
+    Worlds attached to them in this process must not be used afterwards.
+    """
+    for name, _, _ in handle.blocks.values():
+        _detach_block(name)
+
+
+def _detach_block(name: str):
+    block = _ATTACHED.pop(name, None)
+    if block is None:
+        return
+    try:
+        block.close()
+    except BufferError:
+        # Still exported, e.g. to a memoryview of the block
+        _ATTACHED[name] = block
+
+
+class SharedWorld:
+    """Owner of the shared memory blocks of a published grid-world.
+
+    The blocks exist until `unlink` is called, or the `with` block is left. Worlds
+    attached to them must not be used afterwards.
+    """
+
+    _blocks: Dict[str, shared_memory.SharedMemory]
+    _handle: SharedWorldHandle
+
+    def __init__(self, world: GridWorld):
+        model = world.transition_model
+        arrays = {
+            "grid": world.grid,
+            "reward": world.reward,
+            "move_table": world.move_table,
+            "next_states": model.next_states,
+            "rewards": model.rewards,
+            "terminal": model.terminal,
+        }
+
+        self._blocks = {}
+        blocks = {}
+        try:
+            for key, array in arrays.items():
+                size = max(array.nbytes, 1)  # blocks cannot be empty
+                block = shared_memory.SharedMemory(create=True, size=size)
+                self._blocks[key] = block
+                shared = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+                shared[...] = array
+                blocks[key] = (block.name, array.shape, array.dtype.str)
+        except BaseException:
+            self.unlink()
+            raise
+
+        self._handle = SharedWorldHandle(
+            init_pos=world.init_pos,
+            p_slip=world.p_slip,
+            blocks=blocks,
+            reward_fn=world.reward_function,
+        )
+
+    @property
+    def handle(self) -> SharedWorldHandle:
+        return self._handle
+
+    @property
+    def nbytes(self) -> int:
+        """Total size of the shared blocks."""
+        return sum(block.size for block in self._blocks.values())
+
+    def attach(self, seed: Optional[Union[int, npr.Generator]] = None) -> GridWorld:
+        return attach(self._handle, seed)
+
+    def unlink(self):
+        """Releases the shared memory blocks, and detaches them from this process."""
+        for block in self._blocks.values():
+            _detach_block(block.name)
+            block.close()
+            block.unlink()
+        self._blocks = {}
+
+    def __enter__(self) -> "SharedWorld":
+        return self
+
+    def __exit__(self, *exc):
+        self.unlink()
@@ -0,0 +1,323 @@
+"""Dynamic programming solvers for the grid-world.
+
+All solvers work on the compact `TransitionModel` of a world (see
+`GridWorld.transition_model`), so every sweep is a handful of NumPy operations over
+all states instead of Python loops over `next_state` and `reward`. Terminal states
+(goals and obstacles) end the episode, so their value is fixed to 0 and the reward
+for entering them is collected on the transition into them.
+
+The returned policies are (S,) arrays of actions over flat state indices, and can be
+executed with `Agent.gen_policy(policy)`.
+"""
+from typing import Tuple, Union, Optional
+
+import numpy as np
+
+from discrete_world.grid import GridWorld, TransitionModel
+
+MODES = ("sync", "gauss_seidel", "prioritized")
+
+# Synchronous sweeps are computed in chunks of this many states, so that the
+# temporary (chunk, A, K) arrays stay small on large grids.
+CHUNK_SIZE = 1 << 16
+
+
+def _as_model(world: Union[GridWorld, TransitionModel]) -> TransitionModel:
+    if isinstance(world, GridWorld):
+        return world.transition_model
+    return world
+
+
+def _default_block_size(world: Union[GridWorld, TransitionModel]) -> int:
+    """Gauss-Seidel block size: one grid row, or sqrt(S) for a bare model."""
+    if isinstance(world, GridWorld):
+        return world.cols
+    return max(1, int(np.sqrt(len(world.terminal))))
+
+
+def _predecessors(next_states: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """CSR-style (indptr, indices) listing the states that can move into each state."""
+    n_states = next_states.shape[0]
+    flat = next_states.reshape(n_states, -1)
+    sources = np.repeat(np.arange(n_states), flat.shape[1])
+    targets = flat.reshape(-1)
+    order = np.argsort(targets, kind="stable")
+    indptr = np.zeros(n_states + 1, dtype=np.int64)
+    np.cumsum(np.bincount(targets, minlength=n_states), out=indptr[1:])
+    return indptr, sources[order]
+
+
+def _gather(indptr: np.ndarray, indices: np.ndarray, states: np.ndarray) -> np.ndarray:
+    """Concatenation of `indices[indptr[s]:indptr[s + 1]]` for every s in `states`."""
+    starts = indptr[states]
+    lengths = indptr[states + 1] - starts
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return indices[offsets + np.arange(lengths.sum())]
+
+
+def _solve(
+    next_states: np.ndarray,
+    probs: np.ndarray,
+    rewards: np.ndarray,
+    terminal: np.ndarray,
+    values: np.ndarray,
+    gamma: float,
+    tol: float,
+    max_iter: int,
+    mode: str,
+    block_size: int,
+) -> Tuple[np.ndarray, int]:
+    """Iterates the Bellman backup `rewards + gamma * E[values(next_states)]`.
+
+    With (S, A, K) `next_states` and `probs` and (S, A) `rewards` this is the
+    optimality backup (max over actions), with (S, K) and (S,) arrays it is the
+    backup of a fixed policy. Returns the values and the number of sweeps.
+    """
+
+    def backup(states: Union[slice, np.ndarray]) -> np.ndarray:
+        q = rewards[states] + gamma * np.sum(
+            probs[states] * values[next_states[states]], axis=-1
+        )
+        q = q.max(axis=-1) if q.ndim == 2 else q
+        return np.where(terminal[states], 0.0, q)
+
+    if mode not in MODES:
+        raise ValueError("Unknown mode {}. Expected one of {}".format(mode, MODES))
+
+    n_states = len(terminal)
+    values = np.where(terminal, 0.0, values)
+    if mode == "prioritized":
+        indptr, preds = _predecessors(next_states)
+        active = np.flatnonzero(~terminal)
+
+    for it in range(1, max_iter + 1):
+        if mode == "sync":
+            new_values = np.empty_like(values)
+            for start in range(0, n_states, CHUNK_SIZE):
+                states = slice(start, start + CHUNK_SIZE)
+                new_values[states] = backup(states)
+            delta = np.abs(new_values - values).max()
+            values = new_values
+
+        elif mode == "gauss_seidel":
+            # Update the states block by block, in place, so that later blocks
+            # already see the new values. Alternate the sweep direction.
+            delta = 0.0
+            blocks = range(0, n_states, block_size)
+            for start in reversed(blocks) if it % 2 == 0 else blocks:
+                states = slice(start, start + block_size)
+                new_values = backup(states)
+                delta = max(delta, np.abs(new_values - values[states]).max())
+                values[states] = new_values
+
+        elif mode == "prioritized":
+            # Only back up the states one of whose successors changed by more
+            # than `tol` in the previous sweep.
+            new_values = backup(active)
+            changed = np.abs(new_values - values[active]) >= tol
+            values[active] = new_values
+            active = np.unique(_gather(indptr, preds, active[changed]))
+            active = active[~terminal[active]]
+            if active.size == 0:
+                return values, it
+            continue
+
+        if delta < tol:
+            return values, it
+
+    return values, max_iter
+
+
+def q_values(
+    world: Union[GridWorld, TransitionModel], values: np.ndarray, gamma: float
+) -> np.ndarray:
+    """(S, A) action values of a value function."""
+    model = _as_model(world)
+    q = np.empty(model.next_states.shape[:2])
+    for start in range(0, len(q), CHUNK_SIZE):
+        states = slice(start, start + CHUNK_SIZE)
+        probs = model.probs[states]
+        q[states] = np.sum(
+            probs * (model.rewards[states] + gamma * values[model.next_states[states]]),
+            axis=-1,
+        )
+    return q
+
+
+def _expected_reward(model: TransitionModel) -> np.ndarray:
+    """(S, A) expected reward of every state and action."""
+    return q_values(model, np.zeros(len(model.terminal)), 0.0)
+
+
+def greedy_policy(
+    world: Union[GridWorld, TransitionModel], values: np.ndarray, gamma: float
+) -> np.ndarray:
+    """(S,) policy that is greedy with respect to a value function."""
+    return np.argmax(q_values(world, values, gamma), axis=-1)
+
+
+def _initial_values(model: TransitionModel, values: Optional[np.ndarray]) -> np.ndarray:
+    n_states = len(model.terminal)
+    if values is None:
+        return np.zeros(n_states)
+    # A copy, as the solvers update the values in place
+    values = np.array(values, dtype=float).reshape(-1)
+    if values.shape != (n_states,):
+        raise ValueError(
+            "Expected {} initial values. Got {}".format(n_states, values.shape)
+        )
+    return values
+
+
+def value_iteration(
+    world: Union[GridWorld, TransitionModel],
+    gamma: float = 0.95,
+    tol: float = 1e-6,
+    max_iter: int = 10000,
+    values: Optional[np.ndarray] = None,
+    mode: str = "sync",
+    block_size: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Value iteration.
+
+    Args:
+        world: The grid-world or its transition model.
+        gamma: Discount factor.
+        tol: Stop once no value changes by more than `tol` in a sweep.
+        max_iter: Maximum number of sweeps.
+        values: Initial (S,) values to warm-start from.
+        mode: "sync" for Jacobi sweeps over all states, "gauss_seidel" for in-place
+            sweeps over blocks of `block_size` states (default: one grid row), or
+            "prioritized" to only back up states whose successors changed.
+
+    Returns:
+        The greedy (S,) policy and the (S,) values.
+    """
+    model = _as_model(world)
+    expected_reward = _expected_reward(model)
+    values, _ = _solve(
+        model.next_states,
+        model.probs,
+        expected_reward,
+        model.terminal,
+        _initial_values(model, values),
+        gamma,
+        tol,
+        max_iter,
+        mode,
+        block_size or _default_block_size(world),
+    )
+    return greedy_policy(model, values, gamma), values
+
+
+def _improve(
+    q: np.ndarray, policy: np.ndarray, terminal: np.ndarray
+) -> Tuple[np.ndarray, bool]:
+    """Greedy policy from `q`, keeping the old action where it is already optimal."""
+    best = q.max(axis=-1)
+    current = q[np.arange(len(policy)), policy]
+    keep = (current >= best - 1e-12) | terminal
+    stable = bool(keep.all())
+    return np.where(keep, policy, np.argmax(q, axis=-1)), stable
+
+
+def _evaluate(
+    model: TransitionModel,
+    policy: np.ndarray,
+    values: np.ndarray,
+    gamma: float,
+    tol: float,
+    max_iter: int,
+    mode: str,
+    block_size: int,
+) -> np.ndarray:
+    states = np.arange(len(policy))
+    expected_reward = _expected_reward(model)
+    values, _ = _solve(
+        model.next_states[states, policy],
+        model.probs[states, policy],
+        expected_reward[states, policy],
+        model.terminal,
+        values,
+        gamma,
+        tol,
+        max_iter,
+        mode,
+        block_size,
+    )
+    return values
+
+
+def policy_iteration(
+    world: Union[GridWorld, TransitionModel],
+    gamma: float = 0.95,
+    tol: float = 1e-6,
+    max_iter: int = 1000,
+    values: Optional[np.ndarray] = None,
+    policy: Optional[np.ndarray] = None,
+    mode: str = "sync",
+    block_size: Optional[int] = None,
+    eval_sweeps: int = 100000,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Policy iteration.
+
+    Every iteration evaluates the current policy with sweeps until its values change
+    by less than `tol` (at most `eval_sweeps` sweeps), then improves it greedily. The
+    arguments are the same as for `value_iteration`, and `policy` warm-starts the
+    solver from an (S,) policy instead of the one greedy to `values`.
+
+    Returns:
+        The (S,) policy and its (S,) values.
+    """
+    model = _as_model(world)
+    block_size = block_size or _default_block_size(world)
+    values = _initial_values(model, values)
+    if policy is None:
+        policy = greedy_policy(model, values, gamma)
+    policy = np.asarray(policy).reshape(-1)
+
+    for _ in range(max_iter):
+        values = _evaluate(
+            model, policy, values, gamma, tol, eval_sweeps, mode, block_size
+        )
+        policy, stable = _improve(q_values(model, values, gamma), policy, model.terminal)
+        if stable:
+            break
+    return policy, values
+
+
+def modified_policy_iteration(
+    world: Union[GridWorld, TransitionModel],
+    gamma: float = 0.95,
+    tol: float = 1e-6,
+    max_iter: int = 10000,
+    values: Optional[np.ndarray] = None,
+    mode: str = "sync",
+    block_size: Optional[int] = None,
+    eval_sweeps: int = 10,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Modified policy iteration.
+
+    Alternates one greedy improvement with `eval_sweeps` partial evaluation sweeps
+    of the improved policy, and stops once the improvement changes no value by more
+    than `tol`. The arguments are the same as for `value_iteration`.
+
+    Returns:
+        The greedy (S,) policy and the (S,) values.
+    """
+    model = _as_model(world)
+    block_size = block_size or _default_block_size(world)
+    values = _initial_values(model, values)
+    values[model.terminal] = 0.0
+
+    for _ in range(max_iter):
+        q = q_values(model, values, gamma)
+        new_values = np.where(model.terminal, 0.0, q.max(axis=-1))
+        policy = np.argmax(q, axis=-1)
+        if np.abs(new_values - values).max() < tol:
+            values = new_values
+            break
+        values = _evaluate(
+            model, policy, new_values, gamma, 0.0, eval_sweeps, mode, block_size
+        )
+    return greedy_policy(model, values, gamma), values
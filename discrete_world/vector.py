@@ -0,0 +1,155 @@
+from typing import Optional, Tuple, Union
+
+import numpy as np
+import numpy.random as npr
+
+from discrete_world.grid import Actions, GridWorld
+from discrete_world.raster import render_batch
+
+
+class BatchedGridWorld:
+    """Steps `num_envs` independent agents through copies of the same grid-world.
+
+    Agent positions are kept as flat cell indices (`row * cols + col`) in a NumPy
+    array, and every call to `step` samples the slips, applies the moves, looks up
+    the rewards and computes the done flags for all agents with array operations.
+    The dynamics are the same as `GridWorld.step`: with probability `p_slip` the
+    chosen action is replaced uniformly by one of `(a - 1) % 5` and `(a + 1) % 5`,
+    moves that would leave the grid keep the agent in place, the reward is read
+    from the cell that is entered, and an episode is done on a goal or obstacle.
+
+    The move, reward and termination tables are the cached arrays of the wrapped
+    world, so changes to the world are picked up by the next call to `step`.
+    """
+
+    _world: GridWorld
+    _num_envs: int
+    _auto_reset: bool
+    _rng: npr.Generator
+
+    # Current state
+    _pos: np.ndarray
+    _last_actions: np.ndarray
+
+    def __init__(
+        self,
+        world: GridWorld,
+        num_envs: int,
+        seed: Optional[Union[int, npr.Generator]] = None,
+        auto_reset: bool = True,
+    ):
+        """Batch of `num_envs` copies of `world`.
+
+        If `auto_reset` is set, agents whose episode finished are moved back to
+        `init_pos` at the end of `step`, so that the next call starts a new episode.
+        """
+        if num_envs < 1:
+            raise ValueError("Need at least one environment. Got {}".format(num_envs))
+        self._world = world
+        self._num_envs = num_envs
+        self._auto_reset = auto_reset
+        self._rng = npr.default_rng(seed=seed)
+
+        self._last_actions = np.full(num_envs, int(Actions.NO_OP), dtype=np.int64)
+        self.reset()
+
+    @property
+    def _init_index(self) -> int:
+        return self._world.state_to_index(self._world.init_pos)
+
+    @property
+    def world(self) -> GridWorld:
+        return self._world
+
+    @property
+    def num_envs(self) -> int:
+        return self._num_envs
+
+    @property
+    def current_states(self) -> np.ndarray:
+        """ (num_envs, 2) array with the (row, col) position of every agent. """
+        return self._world.index_to_state(self._pos)
+
+    @property
+    def last_actions(self) -> np.ndarray:
+        """ Actions actually executed (after slipping) in the last call to `step`. """
+        return self._last_actions
+
+    def choose_actions(self, actions: np.ndarray) -> np.ndarray:
+        """Probabilistic actions for every agent.
+
+        Vectorized version of `GridWorld.choose_action`.
+        """
+        actions = self._check_actions(actions)
+        return self._execute(actions, self._choose_outcomes())
+
+    def _check_actions(self, actions: np.ndarray) -> np.ndarray:
+        n_actions = len(Actions)
+        actions = np.broadcast_to(np.asarray(actions, dtype=np.int64), self._pos.shape)
+        if actions.min() < 0 or actions.max() >= n_actions:
+            raise ValueError(
+                "Actions need to be in [0, {}). Got {}".format(n_actions, actions)
+            )
+        return actions
+
+    def _choose_outcomes(self) -> np.ndarray:
+        """Index of the outcome of the action of every agent (see `TransitionModel`)."""
+        rolls = self._rng.random(self._num_envs)
+        sides = self._rng.integers(0, 2, self._num_envs)
+        return np.where(rolls >= self._world.p_slip, 0, 1 + sides)
+
+    @staticmethod
+    def _execute(actions: np.ndarray, outcomes: np.ndarray) -> np.ndarray:
+        """Actions executed for the given outcomes of the chosen `actions`."""
+        return (actions + np.array([0, -1, 1])[outcomes]) % len(Actions)
+
+    def step(self, actions: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns next states, observed rewards and dones of all agents.
+
+        The next states are the cells the agents moved into, even for agents that
+        were reset by `auto_reset`; use `current_states` for the positions the next
+        call to `step` will start from.
+        """
+        world = self._world
+        actions = self._check_actions(actions)
+        outcomes = self._choose_outcomes()
+        p_actions = self._execute(actions, outcomes)  # get the stochastic actions
+        next_pos = world.move_table[self._pos, p_actions]  # next states
+        if world.reward_function is None:
+            rewards = world.reward_vector[next_pos]  # rewards observed
+        else:
+            model_rewards = world.transition_model.rewards
+            rewards = model_rewards[self._pos, actions, outcomes]
+        dones = world.terminal_mask[next_pos]  # check if done
+        next_states = self._world.index_to_state(next_pos)
+
+        self._last_actions = p_actions
+        if self._auto_reset:
+            next_pos = np.where(dones, self._init_index, next_pos)
+        self._pos = next_pos  # update current states
+        return (next_states, rewards, dones)
+
+    def reset(self, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """Moves the agents back to `init_pos`.
+
+        If `mask` is given, only the agents where it is True are reset.
+        """
+        if mask is None:
+            self._pos = np.full(self._num_envs, self._init_index, dtype=np.int64)
+        else:
+            self._pos = np.where(mask, self._init_index, self._pos)
+        return self.current_states
+
+    def render(
+        self, cell_size: int = 8, trajectories: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """(num_envs, rows * cell_size, cols * cell_size, 3) `uint8` RGB frames, one
+        per agent, drawn by `discrete_world.raster.render_batch`.
+
+        `trajectories` are (num_envs, T) flat state indices to highlight in every
+        frame, padded with -1.
+        """
+        return render_batch(self._world.grid, self._pos, cell_size, trajectories)
+
+    def seed(self, seed: Optional[Union[int, npr.Generator]] = None):
+        self._rng = npr.default_rng(seed=seed)